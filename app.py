@@ -1,11 +1,13 @@
 import time
-import sqlite3
 import os
 import logging
-from concurrent.futures import ThreadPoolExecutor
-from flask import Flask, request, jsonify
+import asyncio
+import queue
+import threading
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 from dotenv import load_dotenv
-from cachetools import TTLCache
+from cachetools import TTLCache, TLRUCache
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
@@ -16,31 +18,61 @@ from src.core.logging_config import setup_logging, get_logger
 setup_logging()
 logger = get_logger(__name__)
 
-# --- Product scrapers ---
-from src.scrapers.blinkit_scraper import run_scraper
-from src.scrapers.zepto_scraper import run_zepto_scraper
-from src.scrapers.dmart_scraper import run_dmart_scraper
-from src.scrapers.instamart_scraper import run_instamart_scraper
-
-# --- ETA helpers ---
-from src.eta.eta_blinkit import get_blinkit_eta
-from src.eta.eta_zepto import get_zepto_eta
-from src.eta.eta_dmart import get_dmart_eta
-from src.eta.eta_instamart import get_instamart_eta
-
-from src.scrapers.dmart_location import get_store_details
+# --- Platform adapters (scrapers + ETA helpers) ---
+from src.core import registry
+import src.core.platforms  # noqa: F401 (registers the built-in platforms)
+from src.scrapers.blinkit_scraper import DEFAULT_MAX_PRODUCTS, DEFAULT_PAGE_SIZE, MAX_PRODUCTS
+from src.scrapers.instamart_scraper import parser_stats as instamart_parser_stats
 
 # --- Merge logic ---
-from src.core.utils import merge_products
+from src.core.utils import ProductMerger, merge_products
+from src.core.product import Product
+from src.core import jsonio
+
+# --- Fetch engine ---
+from src.core.engine import get_engine, gather_with_deadline, STATUS_OK, STATUS_SKIPPED, STATUS_REJECTED
+from src.core import scheduler, browser_profile
+from src.core.eta_refresher import start_refresher
 
 # --- DB ---
-from src.core.db import DB_NAME, init_db
+from src.core.db import init_db, get_writer, read_pool_stats, search_catalog, find_product, get_price_series
+from src.core.maintenance import start_maintenance, HOURLY_ROLLUP_RETENTION_DAYS
+from src.core import export
 
 # Initialize database on startup
 init_db()
 logger.info("Database initialized")
+maintenance = start_maintenance()
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask's JSON on top of jsonio (orjson when installed), plus Product
+    records encoded straight from their slots. Output is compact UTF-8.
+    """
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, Product):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        return jsonio.dumps(obj, default=self.default)
+
+    def loads(self, s, **kwargs):
+        return jsonio.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Encode straight to bytes, skipping the str round trip
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(jsonio.dumpb(obj, default=self.default) + b"\n",
+                                        mimetype=self.mimetype)
 
 app = Flask(__name__)
+app.json = JSONProvider(app)
+
+# Shared event loop that runs every platform fetch
+engine = get_engine()
 
 # --- Rate Limiting ---
 limiter = Limiter(
@@ -54,24 +86,85 @@ logger.info("Rate limiting enabled")
 # --------------------------------------------------------------------------------------
 #                                   C A C H I N G
 # --------------------------------------------------------------------------------------
-# Using TTLCache with max size to prevent memory leaks
+# TTL caches with a max size to prevent memory leaks
 CACHE_TTL = 300
+# A search where some platform failed or timed out is cached for less time,
+# so the failed platforms are retried soon without re-scraping on every request
+PARTIAL_CACHE_TTL = int(os.getenv("PARTIAL_CACHE_TTL", "30"))
 ETA_CACHE_TTL = 300
 MAX_CACHE_SIZE = 500
+MAX_ETA_CACHE_SIZE = int(os.getenv("ETA_CACHE_SIZE", "20000"))
+
+def eta_expiry(key, value, now):
+    # One entry per (platform, location); each platform has its own TTL
+    adapter = registry.get(key[0])
+    return now + (adapter.eta_ttl if adapter else ETA_CACHE_TTL)
 
-cache = TTLCache(maxsize=MAX_CACHE_SIZE, ttl=CACHE_TTL)
-eta_cache = TTLCache(maxsize=MAX_CACHE_SIZE, ttl=ETA_CACHE_TTL)
+def search_expiry(key, entry, now):
+    complete = all(st in (STATUS_OK, STATUS_SKIPPED) for st in entry["status"].values())
+    return now + (CACHE_TTL if complete else PARTIAL_CACHE_TTL)
+
+cache = TLRUCache(maxsize=MAX_CACHE_SIZE, ttu=search_expiry)
+eta_cache = TLRUCache(maxsize=MAX_ETA_CACHE_SIZE, ttu=eta_expiry)
+# Store resolved for (platform, location), for batch ETA dedup
+store_keys = TTLCache(maxsize=MAX_ETA_CACHE_SIZE, ttl=int(os.getenv("STORE_KEY_TTL", "3600")))
+# Late platform results are written from engine threads, so guard the caches
+cache_lock = threading.Lock()
+
+# Second-level cache: answer from product.db if this location saw matching products recently
+CATALOG_MAX_AGE = int(os.getenv("CATALOG_MAX_AGE", "900"))
 
 def make_cache_key(query, address, pincode):
     norm_addr = (address or "").strip().lower()
     norm_pin = (pincode or "").strip()
     return f"{query}_{norm_addr}_{norm_pin}"
 
+def make_location_key(address, pincode):
+    norm_addr = (address or "").strip().lower()
+    norm_pin = (pincode or "").strip()
+    return f"{norm_addr}_{norm_pin}"
+
 def make_eta_cache_key(address, pincode):
     norm_addr = (address or "").strip().lower()
     norm_pin = (pincode or "").strip()
     return f"eta_{norm_addr}_{norm_pin}"
 
+# --------------------------------------------------------------------------------------
+#                               D E A D L I N E S
+# --------------------------------------------------------------------------------------
+# One budget per request for all platforms together (seconds)
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE", "20"))
+ETA_DEADLINE = float(os.getenv("ETA_DEADLINE", "15"))
+MAX_DEADLINE = 60.0
+
+def get_deadline(data, default):
+    """Per-request deadline from the X-Deadline header or `deadline` field (seconds)."""
+    raw = request.headers.get("X-Deadline") or data.get("deadline")
+    try:
+        value = float(raw) if raw is not None else default
+    except (TypeError, ValueError):
+        return default
+    return max(0.5, min(MAX_DEADLINE, value))
+
+def overloaded(status):
+    """503 + Retry-After when every platform we tried was rejected for capacity."""
+    tried = [st for st in status.values() if st != STATUS_SKIPPED]
+    if not tried or any(st != STATUS_REJECTED for st in tried):
+        return None
+    retry_after = max(pool.retry_after() for pool in scheduler.POOLS.values())
+    resp = jsonify({"error": "Server busy, try again shortly", "status": status})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+def get_int_field(data, name, default, lo, hi):
+    """Read an optional integer request field, clamped to [lo, hi]."""
+    try:
+        value = int(data.get(name, default))
+    except (TypeError, ValueError):
+        return default
+    return max(lo, min(hi, value))
+
 @app.route("/config")
 def get_config():
     return jsonify({
@@ -80,192 +173,589 @@ def get_config():
 # --------------------------------------------------------------------------------------
 #                               DB SAVE HELPER
 # --------------------------------------------------------------------------------------
-def save_products(products):
-    """Save raw scraper products into SQLite."""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    for p in products:
-        try:
-            cur.execute("""
-                INSERT INTO products (name, quantity, platform, price, product_url, image_url, in_stock)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, (
-                p.get("name"),
-                p.get("quantity"),
-                p.get("platform"),
-                p.get("price"),
-                p.get("product_url"),
-                p.get("image_url"),
-                int(p.get("in_stock", True))
-            ))
-        except Exception:
-            pass  # Silently skip DB errors
-    conn.commit()
-    conn.close()
+def save_products(products, location_key=None):
+    """Queue raw scraper products for the background SQLite writer."""
+    get_writer().submit(products, location_key)
+
+# --------------------------------------------------------------------------------------
+#                               FAN-OUT HELPERS
+# --------------------------------------------------------------------------------------
+async def fetch_all_etas(location, deadline, on_late=None, platforms=None):
+    """Fan out ETA lookups; returns ({platform: eta}, {platform: status})."""
+    adapters = registry.adapters("eta")
+    calls = {a.name: a.eta(engine, location) for a in adapters if platforms is None or a.name in platforms}
+    outcomes = await gather_with_deadline(calls, deadline, on_late)
+
+    out, status = {}, {}
+    for a in adapters:
+        st, value = outcomes.get(a.name, (STATUS_SKIPPED, None))
+        status[a.name] = st
+        if a.name in calls:
+            out[a.name] = (value if st == STATUS_OK else None) or "N/A"
+    return out, status
+
+async def fetch_all_products(query, location, platform_filter, deadline, on_late=None, on_done=None, **options):
+    """Fan out product searches; returns (raw products, {platform: status})."""
+    adapters = registry.adapters("search")
+    # Only run a platform if no filter is set OR if the specific platform is requested
+    calls = {
+        a.name: a.search(engine, query, location, **options)
+        for a in adapters if not platform_filter or a.name == platform_filter
+    }
+    outcomes = await gather_with_deadline(calls, deadline, on_late, on_done)
+
+    results, status = [], {}
+    for a in adapters:
+        st, value = outcomes.get(a.name, (STATUS_SKIPPED, None))
+        status[a.name] = st
+        if st == STATUS_OK:
+            batch = value or []
+            logger.debug(f"{a.label}: {len(batch)} products")
+            results += batch
+    return results, status
 
 # --------------------------------------------------------------------------------------
 #                                 /eta
 # --------------------------------------------------------------------------------------
+def cached_etas(eta_key, platforms):
+    """{platform: eta} for the platforms that still have a live cache entry."""
+    out = {}
+    with cache_lock:
+        for p in platforms:
+            value = eta_cache.get((p, eta_key))
+            if value is not None:
+                out[p] = value
+    return out
+
+# ETA helpers report failures as these strings; they are never cached
+ETA_FAILURES = {"N/A", "Error", "Location Setup Failed", "Address Input Failed"}
+
+def cache_eta(eta_key, platform, value):
+    if not value or value in ETA_FAILURES:
+        return
+    with cache_lock:
+        eta_cache[(platform, eta_key)] = value
+
+# Keeps ETAs for recently requested locations warm in eta_cache
+eta_refresher = start_refresher(engine, cache_eta)
+
+def mark_active(eta_key, location):
+    if eta_refresher:
+        eta_refresher.touch(eta_key, location)
+
 @app.route('/eta', methods=['POST'])
 def eta():
     data = request.get_json() or {}
     address = (data.get('address') or "").strip() or "Azad Nagar, Kothrud, Pune"
     pincode = (data.get('pincode') or "").strip() or "411038"
+    deadline = get_deadline(data, ETA_DEADLINE)
 
     eta_key = make_eta_cache_key(address, pincode)
+    mark_active(eta_key, {"address": address, "pincode": pincode})
 
-    # TTLCache handles expiration automatically
-    if eta_key in eta_cache:
+    # Each platform's entry expires on its own TTL; only fetch what is missing
+    cached = cached_etas(eta_key, [a.name for a in registry.adapters("eta")])
+    missing = {a.name for a in registry.adapters("eta")} - set(cached)
+    if not missing:
         logger.debug(f"ETA cache hit for {eta_key}")
-        return jsonify(eta_cache[eta_key])
-
-    out = {"blinkit": "N/A", "zepto": "N/A", "dmart": "N/A", "instamart": "N/A"}
-    with ThreadPoolExecutor(max_workers=4) as ex:
-        fut_b = ex.submit(get_blinkit_eta, address)
-        fut_z = ex.submit(get_zepto_eta, address)
-        fut_d = ex.submit(get_dmart_eta, pincode)
-        fut_i = ex.submit(get_instamart_eta, address)
-
-        try:
-            out["blinkit"] = fut_b.result(timeout=25) or "N/A"
-        except Exception as e:
-            logger.warning(f"Blinkit ETA timeout: {e}")
-        try:
-            out["zepto"] = fut_z.result(timeout=25) or "N/A"
-        except Exception as e:
-            logger.warning(f"Zepto ETA timeout: {e}")
-        try:
-            out["dmart"] = fut_d.result(timeout=25) or "N/A"
-        except Exception as e:
-            logger.warning(f"DMart ETA timeout: {e}")
-        try:
-            out["instamart"] = fut_i.result(timeout=20) or "N/A"
-        except Exception as e:
-            logger.warning(f"Instamart ETA timeout: {e}")
-
-    eta_cache[eta_key] = out
-    return jsonify(out)
-
-# Individual ETA endpoint - refactored to reduce duplication
-ETA_HANDLERS = {
-    'blinkit': lambda addr, pin: get_blinkit_eta(addr),
-    'zepto': lambda addr, pin: get_zepto_eta(addr),
-    'dmart': lambda addr, pin: get_dmart_eta(pin),
-    'instamart': lambda addr, pin: get_instamart_eta(addr),
-}
+        return jsonify({**cached, "status": {p: STATUS_OK for p in cached}})
+
+    def on_late(platform, st, value):
+        # A platform that missed the deadline still lands in the cache
+        if st == STATUS_OK:
+            cache_eta(eta_key, platform, value or "N/A")
+
+    out, status = engine.run(fetch_all_etas({"address": address, "pincode": pincode}, deadline,
+                                            on_late, platforms=missing))
+    busy = overloaded(status)
+    if busy is not None:
+        return busy
+    for platform, value in out.items():
+        if status[platform] == STATUS_OK:
+            cache_eta(eta_key, platform, value)
+    for platform, value in cached.items():
+        out[platform], status[platform] = value, STATUS_OK
+    return jsonify({**out, "status": status})
 
 @app.route('/eta/<platform>', methods=['POST'])
 def eta_single(platform):
     """Single endpoint for individual platform ETAs"""
-    if platform not in ETA_HANDLERS:
+    adapter = registry.get(platform)
+    if not adapter or not adapter.supports("eta"):
         return jsonify({"error": f"Unknown platform: {platform}"}), 400
     
     data = request.get_json() or {}
     address = (data.get('address') or "").strip() or "Azad Nagar, Kothrud, Pune"
     pincode = (data.get('pincode') or "").strip() or "411038"
+    # A single platform gets its own full timeout unless the caller says otherwise
+    deadline = get_deadline(data, adapter.eta_timeout)
     
     eta_key = make_eta_cache_key(address, pincode)
+    mark_active(eta_key, {"address": address, "pincode": pincode})
     
-    # Check cache first (TTLCache handles expiration)
-    if eta_key in eta_cache:
-        cached = eta_cache[eta_key]
-        if platform in cached:
-            return jsonify({"eta": cached.get(platform, "N/A"), "platform": platform})
+    # Check cache first (TLRUCache handles per-platform expiration)
+    cached = cached_etas(eta_key, [platform])
+    if platform in cached:
+        return jsonify({"eta": cached[platform], "platform": platform, "status": STATUS_OK})
     
-    try:
-        eta_result = ETA_HANDLERS[platform](address, pincode)
-        result = {"eta": eta_result or "N/A", "platform": platform}
-        
-        # Update cache
-        if eta_key in eta_cache:
-            eta_cache[eta_key][platform] = eta_result or "N/A"
+    def on_late(name, st, value):
+        if st == STATUS_OK:
+            cache_eta(eta_key, name, value or "N/A")
+
+    out, status = engine.run(fetch_all_etas({"address": address, "pincode": pincode}, deadline,
+                                            on_late, platforms={platform}))
+    busy = overloaded(status)
+    if busy is not None:
+        return busy
+    if status[platform] == STATUS_OK:
+        cache_eta(eta_key, platform, out[platform])
+    return jsonify({"eta": out[platform], "platform": platform, "status": status[platform]})
+
+# --------------------------------------------------------------------------------------
+#                               /eta/batch
+# --------------------------------------------------------------------------------------
+ETA_BATCH_MAX = int(os.getenv("ETA_BATCH_MAX", "500"))
+# Per platform and batch: lookups for locations whose store could not be
+# resolved (one call each); the rest are reported as skipped
+ETA_BATCH_FALLBACKS = int(os.getenv("ETA_BATCH_FALLBACKS", "20"))
+
+def parse_batch_location(item):
+    """{"address", "pincode"} or a bare pincode / address string -> location dict, or None."""
+    if isinstance(item, str):
+        item = {"pincode": item} if item.strip().isdigit() else {"address": item}
+    if not isinstance(item, dict):
+        return None
+    address = (item.get("address") or "").strip()
+    pincode = str(item.get("pincode") or "").strip()
+    if not address and not pincode:
+        return None
+    # A pincode geocodes well enough for the lat/lng based platforms
+    return {"address": address or pincode, "pincode": pincode}
+
+async def resolve_stores(adapter, locations, timeout):
+    """
+    {eta_key: store key} for each location on one platform. Locations whose
+    store cannot be resolved in time are keyed by themselves (no dedup).
+    """
+    keys, calls = {}, {}
+    for eta_key, location in locations.items():
+        with cache_lock:
+            store = store_keys.get((adapter.name, eta_key))
+        if store is not None:
+            keys[eta_key] = store
+        else:
+            calls[eta_key] = adapter.store_key(engine, location)
+
+    # Unfinished resolutions are dropped at the deadline, not left queued
+    outcomes = await gather_with_deadline(calls, timeout, cancel_pending=True)
+    for eta_key, (st, store) in outcomes.items():
+        if st == STATUS_OK and store is not None:
+            with cache_lock:
+                store_keys[(adapter.name, eta_key)] = store
+            keys[eta_key] = store
         else:
-            eta_cache[eta_key] = {platform: eta_result or "N/A"}
-        
-        return jsonify(result)
-    except Exception as e:
-        logger.warning(f"{platform} ETA error: {e}")
-        return jsonify({"eta": "N/A", "platform": platform})
+            keys[eta_key] = f"location:{eta_key}"
+    return keys
+
+async def fetch_batch_etas(locations, platforms, deadline):
+    """
+    ETAs for many locations: one lookup per (platform, store) still missing
+    from the cache. Returns ({eta_key: {platform: eta}}, {eta_key: {platform: status}},
+    {platform: lookups made}).
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    etas = {k: cached_etas(k, [a.name for a in platforms]) for k in locations}
+    status = {k: {p: STATUS_OK for p in etas[k]} for k in locations}
+    lookups = {a.name: 0 for a in platforms}
+
+    # Resolve stores for every platform at once, within half the budget.
+    # Pincode-only platforms (DMart) skip locations given without one.
+    pending = {
+        a.name: {k: loc for k, loc in locations.items()
+                 if a.name not in etas[k] and (loc["pincode"] or not a.supports("needs_pincode"))}
+        for a in platforms
+    }
+    for a in platforms:
+        for k in locations:
+            if a.name not in etas[k] and k not in pending[a.name]:
+                status[k][a.name], etas[k][a.name] = STATUS_SKIPPED, "N/A"
+    resolved = await asyncio.gather(*(
+        resolve_stores(a, pending[a.name], deadline / 2) for a in platforms
+    ))
+
+    calls, members = {}, {}
+    for a, stores in zip(platforms, resolved):
+        groups = {}
+        for eta_key, store in stores.items():
+            groups.setdefault(store, []).append(eta_key)
+        fallbacks = 0
+        for n, (store, keys) in enumerate(groups.items()):
+            # Unresolved locations cost one lookup each; only a few per batch
+            if store.startswith("location:"):
+                fallbacks += 1
+                if fallbacks > ETA_BATCH_FALLBACKS:
+                    status[keys[0]][a.name], etas[keys[0]][a.name] = STATUS_SKIPPED, "N/A"
+                    continue
+            name = f"{a.name}#{n}"
+            calls[name] = a.eta(engine, locations[keys[0]])
+            members[name] = (a.name, keys)
+            lookups[a.name] += 1
+
+    def on_late(name, st, value):
+        if st == STATUS_OK:
+            platform, keys = members[name]
+            for k in keys:
+                cache_eta(k, platform, value or "N/A")
+
+    outcomes = await gather_with_deadline(calls, max(0.0, end - loop.time()), on_late)
+    for name, (st, value) in outcomes.items():
+        platform, keys = members[name]
+        for k in keys:
+            status[k][platform] = st
+            etas[k][platform] = (value if st == STATUS_OK else None) or "N/A"
+            if st == STATUS_OK:
+                cache_eta(k, platform, etas[k][platform])
+    return etas, status, lookups
+
+@app.route('/eta/batch', methods=['POST'])
+def eta_batch():
+    """
+    ETAs for a list of locations (pincodes, addresses or {address, pincode}).
+    Locations served by the same store share one lookup per platform.
+    """
+    data = request.get_json() or {}
+    items = data.get("locations") or []
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Pass a non-empty list of locations"}), 400
+    if len(items) > ETA_BATCH_MAX:
+        return jsonify({"error": f"At most {ETA_BATCH_MAX} locations per batch"}), 400
+
+    wanted = {str(p).strip().lower() for p in data.get("platforms") or []}
+    platforms = [a for a in registry.adapters("eta") if not wanted or a.name in wanted]
+
+    locations = {}
+    for item in items:
+        location = parse_batch_location(item)
+        if location:
+            locations.setdefault(make_eta_cache_key(location["address"], location["pincode"]), location)
+    if not locations:
+        return jsonify({"error": "No valid locations"}), 400
+
+    etas, status, lookups = engine.run(fetch_batch_etas(locations, platforms, get_deadline(data, ETA_DEADLINE)))
+    return jsonify({
+        "results": [
+            {**location, "etas": etas[k], "status": status[k]}
+            for k, location in locations.items()
+        ],
+        "lookups": lookups,
+    })
 
 # --------------------------------------------------------------------------------------
 #                                 /search
 # --------------------------------------------------------------------------------------
-@app.route('/search', methods=['POST'])
-def search():
-    data = request.get_json()
+class SearchRun:
+    """Accumulates one search's platform results and keeps its cache entry current."""
+
+    def __init__(self, params):
+        self.query = params["query"]
+        self.cache_key = params["cache_key"]
+        self.location_key = params["location_key"]
+        self.eta_key = params["eta_key"]
+        # Each platform's products are merged in as they arrive
+        self.merger = ProductMerger()
+        self.status = {}
+        self._lock = threading.Lock()
+
+    def add(self, platform, st, products=None):
+        with self._lock:
+            # A late "ok" must not be overwritten by the deadline's "timeout"
+            if self.status.get(platform) != STATUS_OK:
+                self.status[platform] = st
+            if st == STATUS_OK and products:
+                self.merger.add(products)
+
+    def extend(self, products):
+        with self._lock:
+            self.merger.add(products)
+
+    def snapshot(self):
+        with self._lock:
+            return {"results": self.merger.results(), "status": dict(self.status)}
+
+    def store(self):
+        entry = self.snapshot()
+        # The platforms that answered are cached either way; the entry's status
+        # marks the ones that failed, and such an entry expires after
+        # PARTIAL_CACHE_TTL (a late result that completes it re-stores it)
+        with cache_lock:
+            cache[self.cache_key] = entry
+        return entry
+
+    def save(self, products):
+        save_products(products, self.location_key)
+
+    def complete(self, results, status):
+        """Record the fan-out's final outcome and cache it; returns the response body."""
+        self.save(results)
+        logger.info(f"Found {len(results)} total products for '{self.query}'")
+        for platform, platform_status in status.items():
+            self.add(platform, platform_status)
+        self.extend(results)
+        return self.store()
+
+    def on_eta(self, platform, eta):
+        # ETA found in a search payload: the next /eta for this location is a cache hit
+        cache_eta(self.eta_key, platform, eta)
+        logger.debug(f"Cached {platform} ETA from search: {eta}")
+
+    def on_late(self, platform, st, value):
+        # Fold a late platform into the cached entry so the next request sees it
+        if st != STATUS_OK or not value:
+            return
+        self.save(value)
+        self.add(platform, st, value)
+        self.store()
+        logger.info(f"Cached late {platform} results for '{self.query}' ({len(value)} products)")
+
+def parse_search_request(data):
+    """Normalise /search input; returns a dict of parameters or None if the query is missing."""
     query = (data.get('query') or "").strip().lower()
-    address = (data.get('address') or "").strip()
-    pincode = (data.get('pincode') or "").strip() or "411038"
+    if not query:
+        return None
 
+    address = (data.get('address') or "").strip() or "Kothrud, Pune"
+    pincode = (data.get('pincode') or "").strip() or "411038"
     platform_filter = (data.get('platform') or "").strip().lower()
 
-    if not query:
-        return jsonify({"error": "Missing query"}), 400
+    # Completeness vs latency knobs (fewer products = fewer pages fetched)
+    max_products = get_int_field(data, 'max_products', DEFAULT_MAX_PRODUCTS, 1, MAX_PRODUCTS)
+    page_size = get_int_field(data, 'page_size', DEFAULT_PAGE_SIZE, 1, 50)
 
-    address = address if address else "Kothrud, Pune"
     # Update cache key to include platform filter so specific searches are cached separately
-    cache_key = f"{make_cache_key(query, address, pincode)}_{platform_filter}"
-
+    cache_key = f"{make_cache_key(query, address, pincode)}_{platform_filter}_{max_products}_{page_size}"
+
+    return {
+        "query": query,
+        "location": {"address": address, "pincode": pincode},
+        "platform_filter": platform_filter,
+        "options": {"max_products": max_products, "page_size": page_size},
+        "deadline": get_deadline(data, SEARCH_DEADLINE),
+        "cache_key": cache_key,
+        "location_key": make_location_key(address, pincode),
+        "eta_key": make_eta_cache_key(address, pincode),
+    }
+
+def cached_search(params):
+    """Answer from the in-memory cache, else from the local catalog if it has fresh matches."""
     # TTLCache handles expiration automatically
-    if cache_key in cache:
-        logger.debug(f"Search cache hit for '{query}' (platform: {platform_filter})")
-        return jsonify(cache[cache_key])
+    with cache_lock:
+        cached = cache.get(params["cache_key"])
+    if cached:
+        logger.debug(f"Search cache hit for '{params['query']}' (platform: {params['platform_filter']})")
+        return cached
+
+    platforms = [params["platform_filter"]] if params["platform_filter"] else None
+    products = search_catalog(params["query"], params["location_key"], CATALOG_MAX_AGE, platforms=platforms)
+    if products is None:
+        return None
+
+    logger.debug(f"Catalog hit for '{params['query']}' ({len(products)} products), refreshing")
+    refresh_in_background(params)
+    found = {p["platform"] for p in products}
+    status = {a.name: STATUS_OK if a.name in found else STATUS_SKIPPED for a in registry.adapters("search")}
+    return {"results": merge_products(products), "status": status, "source": "catalog"}
+
+def start_search(params, run, on_done=None):
+    """Kick off the platform fan-out on the engine; returns a concurrent Future."""
+    logger.info(f"Searching for '{params['query']}' at {params['location']['address']} "
+                f"(platform: {params['platform_filter'] or 'all'})")
+    return engine.submit(fetch_all_products(
+        params["query"], params["location"], params["platform_filter"], params["deadline"],
+        on_late=run.on_late, on_done=on_done, on_eta=run.on_eta, **params["options"]
+    ))
+
+refreshing = set()
+refreshing_lock = threading.Lock()
+
+def refresh_in_background(params):
+    """Re-scrape a catalog-served query without blocking the response (one refresh per key)."""
+    key = params["cache_key"]
+    with refreshing_lock:
+        if key in refreshing:
+            return
+        refreshing.add(key)
+
+    run = SearchRun(params)
+
+    def finish(fut):
+        try:
+            results, st = fut.result()
+            engine.loop.run_in_executor(None, run.complete, results, st)
+        except Exception as e:
+            logger.warning(f"Background refresh failed for '{params['query']}': {e!r}")
+        finally:
+            with refreshing_lock:
+                refreshing.discard(key)
 
-    logger.info(f"Searching for '{query}' at {address} (platform: {platform_filter or 'all'})")
-    results = []
-    
-    with ThreadPoolExecutor(max_workers=4) as ex:
-        # Only submit tasks if no filter is set OR if the specific platform is requested
-        fut_blinkit = ex.submit(run_scraper, query) if (not platform_filter or platform_filter == 'blinkit') else None
-        fut_zepto = ex.submit(run_zepto_scraper, query) if (not platform_filter or platform_filter == 'zepto') else None
-        
-        unique_id, store_id = get_store_details(pincode)
-        should_run_dmart = (store_id and (not platform_filter or platform_filter == 'dmart'))
-        fut_dmart = ex.submit(run_dmart_scraper, query, store_id) if should_run_dmart else None
-        
-        fut_instamart = ex.submit(run_instamart_scraper, query, address) if (not platform_filter or platform_filter == 'instamart') else None
-
-        if fut_blinkit:
-            try:
-                b = fut_blinkit.result(timeout=30) or []
-                results += b
-                logger.debug(f"Blinkit: {len(b)} products")
-            except Exception as e:
-                logger.warning(f"Blinkit scraper failed: {e}")
-
-        if fut_zepto:
-            try:
-                z = fut_zepto.result(timeout=30) or []
-                results += z
-                logger.debug(f"Zepto: {len(z)} products")
-            except Exception as e:
-                logger.warning(f"Zepto scraper failed: {e}")
-
-        if fut_dmart:
-            try:
-                d = fut_dmart.result(timeout=30) or []
-                results += d
-                logger.debug(f"DMart: {len(d)} products")
-            except Exception as e:
-                logger.warning(f"DMart scraper failed: {e}")
-        
-        if fut_instamart:
-            try:
-                i = fut_instamart.result(timeout=30) or []
-                results += i
-                logger.debug(f"Instamart: {len(i)} products")
-            except Exception as e:
-                logger.warning(f"Instamart scraper failed: {e}")
-
-    # Save raw results into SQLite
-    save_products(results)
-    logger.info(f"Found {len(results)} total products for '{query}'")
-
-    # Merge products
-    merged_results = merge_products(results)
-
-    cache[cache_key] = merged_results
-    return jsonify(merged_results)
+    start_search(params, run).add_done_callback(finish)
+
+@app.route('/search', methods=['POST'])
+def search():
+    params = parse_search_request(request.get_json() or {})
+    if not params:
+        return jsonify({"error": "Missing query"}), 400
+    # A search is usually followed by an /eta for the same location
+    mark_active(params["eta_key"], params["location"])
+
+    cached = cached_search(params)
+    if cached:
+        return jsonify(cached)
+
+    run = SearchRun(params)
+    results, st = start_search(params, run).result()
+    busy = overloaded(st)
+    if busy is not None:
+        return busy
+
+    # Save raw results into SQLite, merge and cache
+    return jsonify(run.complete(results, st))
+
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """
+    Streaming /search: NDJSON, one line per event.
+    A "platform" event carries a merged snapshot each time a platform finishes;
+    the final "done" event carries the complete result and per-platform status.
+    """
+    params = parse_search_request(request.get_json() or {})
+    if not params:
+        return jsonify({"error": "Missing query"}), 400
+    # A search is usually followed by an /eta for the same location
+    mark_active(params["eta_key"], params["location"])
+
+    def line(event):
+        return app.json.dumps(event) + "\n"
+
+    cached = cached_search(params)
+    if cached:
+        return Response(line({"event": "done", **cached}), mimetype="application/x-ndjson")
+
+    run = SearchRun(params)
+    events = queue.Queue()
+    fut = start_search(params, run, on_done=lambda *event: events.put(event))
+    fut.add_done_callback(lambda _fut: events.put(None))
+
+    def generate():
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            platform, st, products = event
+            if st == STATUS_OK:
+                run.save(products or [])
+            run.add(platform, st, products)
+            yield line({"event": "platform", "platform": platform, "platform_status": st,
+                        "count": len(products or []) if st == STATUS_OK else 0, **run.snapshot()})
+
+        try:
+            _, st = fut.result()
+            for platform, platform_status in st.items():
+                run.add(platform, platform_status)
+        except Exception as e:
+            logger.warning(f"Streaming search failed: {e!r}")
+        yield line({"event": "done", **run.store()})
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+# --------------------------------------------------------------------------------------
+#                              /price-history
+# --------------------------------------------------------------------------------------
+@app.route('/price-history')
+def price_history():
+    """
+    Price series for one platform product, from pre-aggregated rollups.
+    Identify the product by `id`, or by `platform` + `product_url`.
+    """
+    args = request.args
+    if args.get("id"):
+        product = find_product(product_id=get_int_field(args, "id", 0, 0, 2**63 - 1))
+    elif args.get("platform") and args.get("product_url"):
+        product = find_product(platform=args["platform"].strip().lower(),
+                               product_key=args["product_url"].strip())
+    else:
+        return jsonify({"error": "Pass id, or platform and product_url"}), 400
+
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+
+    days = get_int_field(args, "days", 30, 1, 365)
+    # Hourly rollups are only kept for HOURLY_ROLLUP_RETENTION_DAYS (0 = forever)
+    hourly_days = HOURLY_ROLLUP_RETENTION_DAYS or 365
+    resolution = (args.get("resolution") or ("hourly" if days <= min(7, hourly_days) else "daily")).lower()
+    if resolution not in ("hourly", "daily"):
+        return jsonify({"error": "resolution must be hourly or daily"}), 400
+    if resolution == "hourly" and days > hourly_days:
+        return jsonify({"error": f"hourly history only covers the last {hourly_days} days; "
+                                 f"use resolution=daily"}), 400
+
+    since = int(time.time()) - days * 86400
+    return jsonify({
+        "product": product,
+        "resolution": resolution,
+        "days": days,
+        "series": get_price_series(product["id"], since, resolution=resolution),
+    })
+
+# --------------------------------------------------------------------------------------
+#                                 /export
+# --------------------------------------------------------------------------------------
+@app.route('/export')
+def export_observations():
+    """
+    Stream price observations as CSV, JSON Lines or Arrow IPC.
+    Filter with `platform`, `since` / `until` (unix seconds). With `limit`,
+    one page is returned and `X-Next-Cursor` holds the `after` value for the next.
+    """
+    args = request.args
+    fmt = (args.get("format") or "csv").lower()
+    if fmt not in export.available_formats():
+        return jsonify({"error": f"format must be one of {', '.join(export.available_formats())}"}), 400
+
+    body, next_cursor = export.export(
+        fmt,
+        platform=(args.get("platform") or "").strip().lower() or None,
+        since=get_int_field(args, "since", None, 0, 2**63 - 1),
+        until=get_int_field(args, "until", None, 0, 2**63 - 1),
+        after=get_int_field(args, "after", 0, 0, 2**63 - 1),
+        limit=get_int_field(args, "limit", None, 1, 10_000_000),
+    )
+
+    response = Response(stream_with_context(body), mimetype=export.FORMATS[fmt])
+    response.headers["Content-Disposition"] = f"attachment; filename=observations.{fmt}"
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return response
+
+# --------------------------------------------------------------------------------------
+#                                 /stats
+# --------------------------------------------------------------------------------------
+@app.route('/stats')
+def stats():
+    """
+    Queue depth, wait times and in-flight work per resource class and
+    platform, plus DB, maintenance, ETA refresher, parser and browser metrics.
+    """
+    return jsonify({
+        "resources": scheduler.stats(),
+        "platforms": {a.name: a.stats() for a in registry.adapters()},
+        "db_writer": get_writer().stats(),
+        "db_reads": read_pool_stats(),
+        "db_maintenance": maintenance.stats() if maintenance else None,
+        "eta_refresher": eta_refresher.stats() if eta_refresher else None,
+        "instamart_parser": instamart_parser_stats(),
+        "browser_profile": browser_profile.stats(),
+    })
 
 # --------------------------------------------------------------------------------------
 @app.route('/')
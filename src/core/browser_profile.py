@@ -0,0 +1,605 @@
+# browser_profile.py
+"""
+Lightweight Playwright profile shared by every browser-driven scraper
+One launch configuration and one context setup for Zepto and Instamart
+(search and ETA):
+
+- Chromium flags that trim memory and background work (no GPU, extensions,
+  background networking or per-site renderer processes).
+- A small viewport, which means less layout and fewer lazy-loaded tiles.
+- Heavy resource types (images, fonts, media, CSS) and third-party
+  analytics/ads domains are aborted before they are fetched. Each platform
+  can allow some back with <NAME>_ALLOW_RESOURCE_TYPES / <NAME>_ALLOW_DOMAINS
+  (comma-separated), and a caller can allow more for one context, e.g. the
+  Zepto location picker, which needs CSS to click through.
+
+Every Chromium launched through launch() holds one of BROWSER_SLOTS
+process-wide tokens until it disconnects, whether it serves one call or
+sits idle in a pool. Browsers kept alive between calls live in a
+BrowserPool, each owned by one worker thread (sync Playwright objects
+cannot be used from another thread) and closed after BROWSER_IDLE_TIMEOUT
+seconds without work, or sooner when another launch needs its token.
+Async callers on the fetch engine's loop share one SharedBrowser instead,
+with a fresh context per call.
+
+Every context counts requests allowed and blocked, response bytes and page
+load times per platform; GET /stats serves them under "browser_profile".
+
+Usage from the command line (compares a default and a lightweight context):
+    python src/core/browser_profile.py https://www.zeptonow.com/ --platform zepto
+"""
+
+import argparse
+import asyncio
+import atexit
+import contextlib
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+try:
+    from src.core import scheduler
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import scheduler
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--no-first-run",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-extensions",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-renderer-backgrounding",
+    "--mute-audio",
+    "--renderer-process-limit=2",
+    "--disable-features=site-per-process,Translate,BackForwardCache,MediaRouter,OptimizationHints",
+    "--js-flags=--max-old-space-size=256",
+    "--disable-blink-features=AutomationControlled",
+]
+
+VIEWPORT = {
+    "width": int(os.getenv("BROWSER_VIEWPORT_WIDTH", "800")),
+    "height": int(os.getenv("BROWSER_VIEWPORT_HEIGHT", "600")),
+}
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
+    window.chrome = { runtime: {} };
+"""
+
+# Seconds a pooled browser may sit unused before it is closed
+BROWSER_IDLE_TIMEOUT = float(os.getenv("BROWSER_IDLE_TIMEOUT", "300"))
+# Seconds a launch waits for a browser token before giving up
+BROWSER_LAUNCH_WAIT = float(os.getenv("BROWSER_LAUNCH_WAIT", "30"))
+
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+
+# Third-party analytics, tag managers and ad networks (suffix match on host)
+BLOCKED_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "googleadservices.com",
+    "doubleclick.net", "googlesyndication.com", "facebook.net", "facebook.com",
+    "connect.facebook.net", "clarity.ms", "hotjar.com", "mixpanel.com",
+    "amplitude.com", "segment.io", "segment.com", "branch.io", "appsflyer.com",
+    "clevertap-prod.com", "wzrkt.com", "moengage.com", "webengage.com",
+    "sentry.io", "nr-data.net", "newrelic.com", "criteo.com", "criteo.net",
+)
+
+
+def _env_list(name):
+    return frozenset(v.strip().lower() for v in os.getenv(name, "").split(",") if v.strip())
+
+
+def allowlist(platform: str):
+    """(resource types, domains) a platform needs despite the defaults."""
+    prefix = platform.upper()
+    return _env_list(f"{prefix}_ALLOW_RESOURCE_TYPES"), _env_list(f"{prefix}_ALLOW_DOMAINS")
+
+
+def _host_matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+# --------------------------------------------------------------------------------------
+#                                   S T A T S
+# --------------------------------------------------------------------------------------
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _record(platform, **counts):
+    with _stats_lock:
+        entry = _stats.setdefault(platform, {
+            "contexts": 0, "requests": 0, "blocked_type": 0, "blocked_domain": 0,
+            "response_bytes": 0, "page_loads": 0, "page_load_ms": 0.0,
+        })
+        for key, value in counts.items():
+            entry[key] += value
+
+
+def stats() -> dict:
+    """Per-platform request, bandwidth and page-load counters, and browser pool sizes."""
+    with _stats_lock:
+        out = {}
+        for platform, entry in _stats.items():
+            entry = dict(entry)
+            loads = entry.pop("page_load_ms")
+            entry["avg_page_load_ms"] = round(loads / entry["page_loads"], 1) if entry["page_loads"] else None
+            out[platform] = entry
+    for platform, pool in list(_pools.items()):
+        out.setdefault(platform, {})["pool"] = pool.stats()
+    out["live_browsers"] = _budget.stats()
+    if _shared is not None:
+        out["shared_browser"] = _shared.stats()
+    return out
+
+
+# --------------------------------------------------------------------------------------
+#                                   B U D G E T
+# --------------------------------------------------------------------------------------
+class BrowserBudget:
+    """
+    Process-wide count of live Chromium instances, capped at `slots`. A
+    launch that finds the budget full asks the pools to close an idle
+    browser and waits for a token.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = max(1, slots)
+        self.live = 0
+        self._cond = threading.Condition()
+
+    def _try_take(self) -> bool:
+        """Take a token if one is free; otherwise shed an idle pooled browser. Holds _cond."""
+        if self.live < self.slots:
+            self.live += 1
+            return True
+        any(pool.shed_idle() for pool in list(_pools.values()))
+        return False
+
+    def take(self, timeout: float = BROWSER_LAUNCH_WAIT):
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._try_take():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise RuntimeError(f"No browser slot free within {timeout:.0f}s ({self.slots} live)")
+                # A shed browser hands its token back as it closes
+                self._cond.wait(min(left, 0.2))
+
+    async def take_async(self, timeout: float = BROWSER_LAUNCH_WAIT):
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._try_take():
+                    return
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"No browser slot free within {timeout:.0f}s ({self.slots} live)")
+            await asyncio.sleep(0.1)
+
+    def release(self):
+        with self._cond:
+            self.live = max(0, self.live - 1)
+            self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"live": self.live, "slots": self.slots}
+
+
+_budget = BrowserBudget(scheduler.get_pool(scheduler.BROWSER).slots)
+
+
+# --------------------------------------------------------------------------------------
+#                                   P R O F I L E
+# --------------------------------------------------------------------------------------
+def launch(playwright, headless: bool = True, **kwargs):
+    """
+    Launch Chromium with the shared flags. Takes a browser token (waiting,
+    or shedding an idle pooled browser, if BROWSER_SLOTS are all live) that
+    goes back when the browser closes or dies.
+    """
+    _budget.take()
+    try:
+        browser = playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS, **kwargs)
+    except BaseException:
+        _budget.release()
+        raise
+    browser.once("disconnected", lambda *_: _budget.release())
+    return browser
+
+
+async def launch_async(playwright, headless: bool = True, **kwargs):
+    """launch() for playwright.async_api; waits for a token without blocking the loop."""
+    await _budget.take_async()
+    try:
+        browser = await playwright.chromium.launch(headless=headless, args=LAUNCH_ARGS, **kwargs)
+    except BaseException:
+        _budget.release()
+        raise
+    browser.once("disconnected", lambda *_: _budget.release())
+    return browser
+
+
+def _context_options(kwargs):
+    options = {"viewport": VIEWPORT, "locale": "en-IN", "timezone_id": "Asia/Kolkata"}
+    options.update(kwargs)
+    return options
+
+
+def _profile_hooks(platform, allow_types, allow_domains):
+    """(blocked(request) -> bool, on_response(response)) for one context."""
+    env_types, env_domains = allowlist(platform)
+    blocked_types = BLOCKED_RESOURCE_TYPES - env_types - set(allow_types)
+    allowed_domains = env_domains | set(allow_domains)
+
+    def blocked(request):
+        if request.resource_type in blocked_types:
+            _record(platform, blocked_type=1)
+            return True
+        host = urlsplit(request.url).hostname or ""
+        if _host_matches(host, BLOCKED_DOMAINS) and not _host_matches(host, allowed_domains):
+            _record(platform, blocked_domain=1)
+            return True
+        _record(platform, requests=1)
+        return False
+
+    def on_response(response):
+        try:
+            size = int(response.headers.get("content-length") or 0)
+        except ValueError:
+            size = 0
+        _record(platform, response_bytes=size)
+
+    return blocked, on_response
+
+
+def new_context(browser, platform: str, allow_types=(), allow_domains=(),
+                user_agent: str = USER_AGENT, **kwargs):
+    """
+    New context with the lightweight profile for `platform`. `allow_types`
+    and `allow_domains` add to the platform's allowlist for this context.
+    Extra keyword arguments go to browser.new_context().
+    """
+    context = browser.new_context(user_agent=user_agent, **_context_options(kwargs))
+    context.add_init_script(STEALTH_SCRIPT)
+    blocked, on_response = _profile_hooks(platform, allow_types, allow_domains)
+
+    def route(route):
+        return route.abort() if blocked(route.request) else route.continue_()
+
+    context.route("**/*", route)
+    context.on("response", on_response)
+    _record(platform, contexts=1)
+    return context
+
+
+async def new_context_async(browser, platform: str, allow_types=(), allow_domains=(),
+                            user_agent: str = USER_AGENT, **kwargs):
+    """new_context() for a playwright.async_api browser."""
+    context = await browser.new_context(user_agent=user_agent, **_context_options(kwargs))
+    await context.add_init_script(STEALTH_SCRIPT)
+    blocked, on_response = _profile_hooks(platform, allow_types, allow_domains)
+
+    async def route(route):
+        if blocked(route.request):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", route)
+    context.on("response", on_response)
+    _record(platform, contexts=1)
+    return context
+
+
+def goto(page, platform: str, url: str, **kwargs):
+    """page.goto() that records the page load time for `platform`."""
+    start = time.monotonic()
+    try:
+        return page.goto(url, **kwargs)
+    finally:
+        _record(platform, page_loads=1, page_load_ms=(time.monotonic() - start) * 1000)
+
+
+async def goto_async(page, platform: str, url: str, **kwargs):
+    """goto() for a playwright.async_api page."""
+    start = time.monotonic()
+    try:
+        return await page.goto(url, **kwargs)
+    finally:
+        _record(platform, page_loads=1, page_load_ms=(time.monotonic() - start) * 1000)
+
+
+# --------------------------------------------------------------------------------------
+#                                   P O O L
+# --------------------------------------------------------------------------------------
+class BrowserPool:
+    """
+    Up to `size` browsers for one platform, each with one lightweight context.
+
+    run(fn, *args) calls fn(context, *args) on a worker thread that owns a
+    browser, in a copy of the caller's context variables, and blocks until
+    it returns. Workers (and their browsers) start on demand and close after
+    `idle` seconds without a job.
+    """
+
+    def __init__(self, platform: str, size: int, idle: float = BROWSER_IDLE_TIMEOUT, **context_options):
+        self.platform = platform
+        self.size = max(1, size)
+        self.idle = idle
+        self.context_options = context_options
+        self._jobs = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._workers = 0
+        self._free = 0
+        self._pending = 0
+        self._shedding = 0
+        self.launched = 0
+
+    def run(self, fn, *args, **kwargs):
+        future = Future()
+        with self._lock:
+            self._pending += 1
+            if self._pending > self._free and self._workers < self.size:
+                self._workers += 1
+                threading.Thread(target=self._work, name=f"{self.platform}-browser", daemon=True).start()
+        self._jobs.put((future, contextvars.copy_context(), fn, args, kwargs))
+        return future.result()
+
+    def close(self):
+        """Close every browser; the pool starts new ones on the next run()."""
+        with self._lock:
+            workers = self._workers
+        for _ in range(workers):
+            self._jobs.put(None)
+
+    def shed_idle(self) -> bool:
+        """Ask one idle worker to close its browser; False if none is idle."""
+        with self._lock:
+            if self._free - self._shedding <= self._pending:
+                return False
+            self._shedding += 1
+        self._jobs.put(None)
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"browsers": self._workers, "size": self.size, "launched": self.launched}
+
+    def _next_job(self):
+        """Next job, or None when the worker should exit (idle or closed)."""
+        while True:
+            with self._lock:
+                self._free += 1
+            try:
+                job = self._jobs.get(timeout=self.idle)
+            except queue.Empty:
+                with self._lock:
+                    self._free -= 1
+                    # A job was queued as the wait ran out: stay for it
+                    if self._pending > self._free:
+                        continue
+                    self._workers -= 1
+                return None
+            with self._lock:
+                self._free -= 1
+                if job is None:
+                    self._workers -= 1
+                    self._shedding = max(0, self._shedding - 1)
+                else:
+                    self._pending -= 1
+            return job
+
+    def _work(self):
+        from playwright.sync_api import sync_playwright
+
+        playwright = browser = context = None
+        try:
+            while True:
+                job = self._next_job()
+                if job is None:
+                    return
+                future, ctx, fn, args, kwargs = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if browser is None or not browser.is_connected():
+                        if playwright is None:
+                            playwright = sync_playwright().start()
+                        browser = launch(playwright)
+                        context = new_context(browser, self.platform, **self.context_options)
+                        with self._lock:
+                            self.launched += 1
+                    future.set_result(ctx.run(fn, context, *args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            try:
+                if browser is not None:
+                    browser.close()
+                if playwright is not None:
+                    playwright.stop()
+            except Exception as e:
+                logger.debug(f"{self.platform}: browser shutdown failed: {e}")
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(platform: str, **context_options) -> BrowserPool:
+    """Process-wide browser pool for `platform`, sized to BROWSER_SLOTS."""
+    pool = _pools.get(platform)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(platform)
+            if pool is None:
+                size = scheduler.get_pool(scheduler.BROWSER).slots
+                pool = _pools[platform] = BrowserPool(platform, size, **context_options)
+    return pool
+
+
+@atexit.register
+def close_pools():
+    for pool in list(_pools.values()):
+        pool.close()
+
+
+class SharedBrowser:
+    """
+    One playwright.async_api Chromium on the running event loop, shared by
+    any number of concurrent calls with one context each. It starts on first
+    use, holds one browser token while alive and closes after `idle` seconds
+    with no context open.
+    """
+
+    def __init__(self, idle: float = BROWSER_IDLE_TIMEOUT):
+        self.idle = idle
+        self.loop = asyncio.get_running_loop()
+        self._playwright = None
+        self._browser = None
+        self._lock = asyncio.Lock()
+        self._users = 0
+        self._idle_timer = None
+        self.launched = 0
+
+    async def _get(self):
+        async with self._lock:
+            if self._browser is None or not self._browser.is_connected():
+                if self._playwright is None:
+                    from playwright.async_api import async_playwright
+                    self._playwright = await async_playwright().start()
+                self._browser = await launch_async(self._playwright)
+                self.launched += 1
+            return self._browser
+
+    @contextlib.asynccontextmanager
+    async def context(self, platform: str, **options):
+        """A fresh lightweight context for `platform`, closed on exit."""
+        self._users += 1
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        try:
+            context = await new_context_async(await self._get(), platform, **options)
+            try:
+                yield context
+            finally:
+                await context.close()
+        finally:
+            self._users -= 1
+            if not self._users:
+                self._idle_timer = self.loop.call_later(
+                    self.idle, lambda: self.loop.create_task(self._close_if_idle()))
+
+    async def _close_if_idle(self):
+        async with self._lock:
+            if self._users or self._browser is None:
+                return
+            browser, self._browser = self._browser, None
+        try:
+            await browser.close()
+        except Exception as e:
+            logger.debug(f"Shared browser shutdown failed: {e}")
+
+    async def close(self):
+        """Close the browser and stop Playwright (scripts, before their loop ends)."""
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        async with self._lock:
+            browser, self._browser = self._browser, None
+            playwright, self._playwright = self._playwright, None
+        if browser is not None:
+            await browser.close()
+        if playwright is not None:
+            await playwright.stop()
+
+    def stats(self) -> dict:
+        return {"open": self._browser is not None, "contexts": self._users, "launched": self.launched}
+
+
+_shared = None
+
+
+def get_shared_browser() -> SharedBrowser:
+    """The shared async browser for the running loop (the fetch engine's, in the app)."""
+    global _shared
+    loop = asyncio.get_running_loop()
+    if _shared is None or _shared.loop is not loop:
+        _shared = SharedBrowser()
+    return _shared
+
+
+# --------------------------------------------------------------------------------------
+#                                   M E A S U R E
+# --------------------------------------------------------------------------------------
+def _chromium_rss_kib() -> int:
+    """Summed RSS of running Chromium processes (Linux /proc), in KiB."""
+    total = 0
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"chrom" not in f.read().split(b"\0")[0].lower():
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, IndexError):
+            continue
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare a default and a lightweight browser context")
+    parser.add_argument("url")
+    parser.add_argument("--platform", default="measure")
+    parser.add_argument("--wait", type=float, default=3.0, help="seconds to stay on the page")
+    args = parser.parse_args(argv)
+
+    from playwright.sync_api import sync_playwright
+
+    def run(p, light):
+        browser = launch(p) if light else p.chromium.launch(headless=True)
+        baseline = _chromium_rss_kib()
+        if light:
+            context = new_context(browser, args.platform)
+        else:
+            context = browser.new_context(user_agent=USER_AGENT, viewport={"width": 1920, "height": 1080})
+        received = []
+        context.on("response", lambda r: received.append(int(r.headers.get("content-length") or 0)))
+        page = context.new_page()
+        start = time.monotonic()
+        page.goto(args.url, wait_until="load", timeout=60000)
+        load = time.monotonic() - start
+        page.wait_for_timeout(args.wait * 1000)
+        rss = _chromium_rss_kib() - baseline
+        browser.close()
+        return load, len(received), sum(received), rss
+
+    with sync_playwright() as p:
+        for label, light in (("default", False), ("lightweight", True)):
+            load, count, size, rss = run(p, light)
+            print(f"{label:12} load {load:6.2f}s  responses {count:4d}  "
+                  f"bytes {size / 1024:8.0f} KiB  context RSS {rss / 1024:6.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,653 @@
 # db.py
+import contextlib
 import sqlite3
+import threading
+import queue
+import time
+import atexit
+import logging
+import os
+import re
+
+from src.core.product import Product
+
+logger = logging.getLogger(__name__)
 
 DB_NAME = "product.db"
 
-def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-
-    # raw scraped products (platform-specific)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS products (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT,
-        quantity TEXT,
-        platform TEXT,
-        price TEXT,
-        product_url TEXT,
-        image_url TEXT,
-        in_stock BOOLEAN,
-        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
+# Background writer tuning
+WRITE_QUEUE_SIZE = int(os.getenv("DB_WRITE_QUEUE", "256"))      # pending batches (one per search)
+WRITE_BATCH_ROWS = int(os.getenv("DB_WRITE_BATCH_ROWS", "1000"))  # rows per transaction
+WRITE_FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", "1.0"))  # seconds
+
+# Read connections shared by all request threads
+READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+READ_POOL_WAIT = float(os.getenv("DB_READ_POOL_WAIT", "5"))  # seconds
+
+
+def connect(db_name=DB_NAME, check_same_thread=True):
+    """Open a connection with the pragmas every QuickKart connection should use."""
+    conn = sqlite3.connect(db_name, timeout=10, check_same_thread=check_same_thread)
+    conn.execute("PRAGMA journal_mode=WAL")      # readers never block the writer
+    conn.execute("PRAGMA synchronous=NORMAL")    # safe with WAL, far fewer fsyncs
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-8000")      # ~8 MB page cache
+    return conn
+
+
+# Local catalog (second-level search cache)
+CATALOG_MIN_RESULTS = int(os.getenv("CATALOG_MIN_RESULTS", "5"))
+
+SCHEMA = """
+-- one row per product per platform, keyed by its URL (or name + quantity)
+CREATE TABLE IF NOT EXISTS platform_products (
+    id INTEGER PRIMARY KEY,
+    platform TEXT NOT NULL,
+    product_key TEXT NOT NULL,
+    name TEXT,
+    quantity TEXT,
+    product_url TEXT,
+    image_url TEXT,
+    first_seen INTEGER NOT NULL,
+    last_seen INTEGER NOT NULL,
+    last_price_paise INTEGER,
+    last_in_stock INTEGER,
+    UNIQUE (platform, product_key)
+);
+CREATE INDEX IF NOT EXISTS idx_platform_products_last_seen ON platform_products (last_seen);
+
+-- a row only when price or stock actually changed
+CREATE TABLE IF NOT EXISTS price_observations (
+    id INTEGER PRIMARY KEY,
+    product_id INTEGER NOT NULL REFERENCES platform_products (id),
+    price_paise INTEGER,
+    in_stock INTEGER NOT NULL,
+    observed_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_price_observations_product_time
+    ON price_observations (product_id, observed_at);
+
+-- which products were seen for which location, and when
+CREATE TABLE IF NOT EXISTS catalog_entries (
+    product_id INTEGER NOT NULL REFERENCES platform_products (id),
+    location_key TEXT NOT NULL,
+    last_seen INTEGER NOT NULL,
+    PRIMARY KEY (product_id, location_key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_catalog_entries_location ON catalog_entries (location_key, last_seen);
+
+CREATE TRIGGER IF NOT EXISTS trg_price_observations_last
+AFTER INSERT ON price_observations
+BEGIN
+    UPDATE platform_products
+       SET last_price_paise = NEW.price_paise, last_in_stock = NEW.in_stock
+     WHERE id = NEW.product_id;
+END;
+"""
 
-    conn.commit()
+
+def init_db(db_name=DB_NAME):
+    conn = connect(db_name)
+    _enable_incremental_vacuum(conn)
+    conn.executescript(SCHEMA)
+    migrate(conn)
     conn.close()
 
+
+def _enable_incremental_vacuum(conn):
+    """
+    Let maintenance.py hand free pages back a few at a time. A new, empty file
+    is switched here. An existing one needs a full VACUUM to switch, which is
+    never run at startup: `python src/core/maintenance.py --enable-incremental-vacuum`
+    does it once, on request.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    if conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+        logger.info("product.db does not use incremental auto-vacuum; run "
+                    "`python src/core/maintenance.py --enable-incremental-vacuum` once to switch")
+        return
+    # connect() already wrote the header (WAL), so even an empty file takes a
+    # VACUUM to switch; with no tables it costs nothing
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+# --------------------------------------------------------------------------------------
+#                                   W R I T E S
+# --------------------------------------------------------------------------------------
+_PRICE_RE = re.compile(r"[^\d.]")
+
+
+def price_to_paise(price):
+    """'₹1,234.50' -> 123450; None for missing/unparseable prices."""
+    if price is None:
+        return None
+    if isinstance(price, (int, float)):
+        return int(round(price * 100))
+    digits = _PRICE_RE.sub("", str(price))
+    try:
+        return int(round(float(digits) * 100)) if digits else None
+    except ValueError:
+        return None
+
+
+def product_key(p):
+    """Stable identity of a product on its platform."""
+    return p.get("product_url") or f"{p.get('name') or ''}|{p.get('quantity') or ''}"
+
+
+def product_row(p, observed_at, location_key=None):
+    return {
+        "platform": p.get("platform"),
+        "product_key": product_key(p),
+        "name": p.get("name"),
+        "quantity": p.get("quantity"),
+        "product_url": p.get("product_url"),
+        "image_url": p.get("image_url"),
+        "price_paise": price_to_paise(p.get("price")),
+        "in_stock": int(bool(p.get("in_stock", True))),
+        "observed_at": observed_at,
+        "location_key": location_key,
+    }
+
+
+UPSERT_PRODUCT = """
+    INSERT INTO platform_products
+        (platform, product_key, name, quantity, product_url, image_url, first_seen, last_seen)
+    VALUES (:platform, :product_key, :name, :quantity, :product_url, :image_url,
+            :observed_at, :observed_at)
+    ON CONFLICT (platform, product_key) DO UPDATE SET
+        name = excluded.name,
+        quantity = excluded.quantity,
+        product_url = excluded.product_url,
+        image_url = COALESCE(excluded.image_url, image_url),
+        last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+# Only inserts when price or stock differs from the last observation
+INSERT_OBSERVATION = """
+    INSERT INTO price_observations (product_id, price_paise, in_stock, observed_at)
+    SELECT id, :price_paise, :in_stock, :observed_at FROM platform_products
+     WHERE platform = :platform AND product_key = :product_key
+       AND (last_in_stock IS NULL
+            OR last_price_paise IS NOT :price_paise
+            OR last_in_stock IS NOT :in_stock)
+"""
+
+
+UPSERT_CATALOG_ENTRY = """
+    INSERT INTO catalog_entries (product_id, location_key, last_seen)
+    SELECT id, :location_key, :observed_at FROM platform_products
+     WHERE platform = :platform AND product_key = :product_key
+    ON CONFLICT (product_id, location_key) DO UPDATE SET
+        last_seen = MAX(last_seen, excluded.last_seen)
+"""
+
+
+def record_products(conn, rows):
+    """
+    Upsert product rows (see product_row) and append observations for the
+    ones whose price or stock changed. Runs in the caller's transaction.
+    Returns the number of observations written.
+    """
+    rows = [r for r in rows if r["platform"] and r["product_key"]]
+    conn.executemany(UPSERT_PRODUCT, rows)
+    cur = conn.executemany(INSERT_OBSERVATION, rows)
+    observations = max(cur.rowcount, 0)
+    conn.executemany(UPSERT_CATALOG_ENTRY, [r for r in rows if r["location_key"]])
+    return observations
+
+
+# --------------------------------------------------------------------------------------
+#                               M I G R A T I O N S
+# --------------------------------------------------------------------------------------
+def _migrate_legacy_products(conn):
+    """v1: fold the append-only `products` log into platform_products + price_observations."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'"
+    ).fetchone()
+    if not exists:
+        return
+
+    cur = conn.execute("""
+        SELECT name, quantity, platform, price, product_url, image_url, in_stock,
+               CAST(strftime('%s', COALESCE(scraped_at, CURRENT_TIMESTAMP)) AS INTEGER)
+          FROM products ORDER BY id
+    """)
+    migrated = 0
+    while True:
+        chunk = cur.fetchmany(5000)
+        if not chunk:
+            break
+        rows = [
+            product_row({
+                "name": name, "quantity": qty, "platform": platform, "price": price,
+                "product_url": url, "image_url": img, "in_stock": in_stock,
+            }, observed_at)
+            for name, qty, platform, price, url, img, in_stock, observed_at in chunk
+        ]
+        record_products(conn, rows)
+        migrated += len(rows)
+
+    conn.execute("DROP TABLE products")
+    logger.info(f"Migrated {migrated} legacy product rows")
+
+
+def _create_catalog_index(conn):
+    """v2: FTS5 index over product names, kept in sync with platform_products by triggers."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_fts USING fts5(
+            name, quantity,
+            content = 'platform_products', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_catalog_fts_insert
+        AFTER INSERT ON platform_products
+        BEGIN
+            INSERT INTO catalog_fts (rowid, name, quantity) VALUES (NEW.id, NEW.name, NEW.quantity);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_catalog_fts_update
+        AFTER UPDATE OF name, quantity ON platform_products
+        WHEN OLD.name IS NOT NEW.name OR OLD.quantity IS NOT NEW.quantity
+        BEGIN
+            INSERT INTO catalog_fts (catalog_fts, rowid, name, quantity)
+                VALUES ('delete', OLD.id, OLD.name, OLD.quantity);
+            INSERT INTO catalog_fts (rowid, name, quantity) VALUES (NEW.id, NEW.name, NEW.quantity);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_catalog_fts_delete
+        AFTER DELETE ON platform_products
+        BEGIN
+            INSERT INTO catalog_fts (catalog_fts, rowid, name, quantity)
+                VALUES ('delete', OLD.id, OLD.name, OLD.quantity);
+        END
+    """)
+    conn.execute("INSERT INTO catalog_fts (catalog_fts) VALUES ('rebuild')")
+
+
+ROLLUPS = {"hourly": 3600, "daily": 86400}
+
+
+def _create_price_rollups(conn):
+    """v3: hourly/daily min/max/last per platform product, maintained by triggers."""
+    for resolution, seconds in ROLLUPS.items():
+        table = f"price_rollup_{resolution}"
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                product_id INTEGER NOT NULL,
+                bucket INTEGER NOT NULL,
+                min_paise INTEGER NOT NULL,
+                max_paise INTEGER NOT NULL,
+                last_paise INTEGER NOT NULL,
+                last_at INTEGER NOT NULL,
+                samples INTEGER NOT NULL,
+                PRIMARY KEY (product_id, bucket)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}
+            AFTER INSERT ON price_observations
+            WHEN NEW.price_paise IS NOT NULL
+            BEGIN
+                INSERT INTO {table}
+                    (product_id, bucket, min_paise, max_paise, last_paise, last_at, samples)
+                VALUES (NEW.product_id, NEW.observed_at / {seconds} * {seconds},
+                        NEW.price_paise, NEW.price_paise, NEW.price_paise, NEW.observed_at, 1)
+                ON CONFLICT (product_id, bucket) DO UPDATE SET
+                    min_paise = MIN(min_paise, excluded.min_paise),
+                    max_paise = MAX(max_paise, excluded.max_paise),
+                    last_paise = CASE WHEN excluded.last_at >= last_at
+                                      THEN excluded.last_paise ELSE last_paise END,
+                    last_at = MAX(last_at, excluded.last_at),
+                    samples = samples + 1;
+            END
+        """)
+        # Backfill from observations already on disk
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {table}
+                (product_id, bucket, min_paise, max_paise, last_paise, last_at, samples)
+            SELECT product_id, observed_at / {seconds} * {seconds},
+                   MIN(price_paise), MAX(price_paise),
+                   (SELECT o2.price_paise FROM price_observations o2
+                     WHERE o2.product_id = o.product_id AND o2.price_paise IS NOT NULL
+                       AND o2.observed_at / {seconds} = o.observed_at / {seconds}
+                     ORDER BY o2.observed_at DESC, o2.id DESC LIMIT 1),
+                   MAX(observed_at), COUNT(*)
+              FROM price_observations o
+             WHERE price_paise IS NOT NULL
+             GROUP BY product_id, observed_at / {seconds}
+        """)
+
+
+MIGRATIONS = [
+    _migrate_legacy_products,   # -> 1
+    _create_catalog_index,      # -> 2
+    _create_price_rollups,      # -> 3
+]
+
+
+def migrate(conn):
+    """Apply pending migrations, each in its own transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, step in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+        logger.info(f"Database migrated to schema v{target}")
+
+
+# --------------------------------------------------------------------------------------
+#                                    R E A D S
+# --------------------------------------------------------------------------------------
+_FTS_TOKEN_RE = re.compile(r"[^\W\d_]{2,}", re.UNICODE)
+
+
+class ReadPool:
+    """
+    Bounded pool of read connections (WAL lets these run alongside the writer).
+    Flask serves each request on a fresh thread, so connections are lent out
+    per query instead of per thread; at most `size` are ever opened.
+    """
+
+    def __init__(self, size=READ_POOL_SIZE, wait=READ_POOL_WAIT):
+        self.size = size
+        self.wait = wait
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.waits = 0
+
+    def get(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self.opened < self.size:
+                self.opened += 1
+                fresh = True
+            else:
+                fresh = False
+                self.waits += 1
+        if not fresh:
+            try:
+                return self._idle.get(timeout=self.wait)
+            except queue.Empty:
+                raise sqlite3.OperationalError("no read connection free") from None
+        try:
+            return connect(check_same_thread=False)
+        except BaseException:
+            with self._lock:
+                self.opened -= 1
+            raise
+
+    def put(self, conn):
+        self._idle.put(conn)
+
+    def stats(self) -> dict:
+        return {"size": self.size, "opened": self.opened,
+                "idle": self._idle.qsize(), "waits": self.waits}
+
+
+_read_pool = ReadPool()
+
+
+@contextlib.contextmanager
+def read_conn():
+    """Borrow a read connection for one query; it goes back to the pool afterwards."""
+    conn = _read_pool.get()
+    try:
+        yield conn
+    finally:
+        _read_pool.put(conn)
+
+
+def read_pool_stats() -> dict:
+    return _read_pool.stats()
+
+
+def format_price(paise):
+    if paise is None:
+        return "N/A"
+    rupees, rem = divmod(paise, 100)
+    return f"₹{rupees}" if not rem else f"₹{rupees}.{rem:02d}"
+
+
+def fts_query(text):
+    """
+    'Amul milk 1l' -> '"amul"* AND "milk"*'
+    Only word tokens are required; pack sizes like '1l' are left to ranking,
+    so a new-but-similar query still matches what an earlier one scraped.
+    """
+    tokens = _FTS_TOKEN_RE.findall((text or "").lower())
+    return " AND ".join(f'"{t}"*' for t in tokens)
+
+
+def search_catalog(query, location_key, max_age, limit=200, platforms=None,
+                   min_results=CATALOG_MIN_RESULTS):
+    """
+    Products seen for `location_key` within `max_age` seconds whose name
+    matches `query`, best match first, as Product records.
+    Returns None when there are not enough fresh matches to answer from.
+    """
+    match = fts_query(query)
+    if not match or not location_key:
+        return None
+
+    sql = """
+        SELECT p.platform, p.name, p.quantity, p.last_price_paise, p.product_url,
+               p.image_url, p.last_in_stock
+          FROM catalog_fts f
+          JOIN platform_products p ON p.id = f.rowid
+          JOIN catalog_entries e ON e.product_id = p.id
+         WHERE catalog_fts MATCH ?
+           AND e.location_key = ?
+           AND e.last_seen >= ?
+    """
+    args = [match, location_key, int(time.time() - max_age)]
+    if platforms:
+        sql += f" AND p.platform IN ({','.join('?' * len(platforms))})"
+        args += list(platforms)
+    sql += " ORDER BY f.rank LIMIT ?"
+    args.append(limit)
+
+    try:
+        with read_conn() as conn:
+            rows = conn.execute(sql, args).fetchall()
+    except sqlite3.Error as e:
+        logger.warning(f"Catalog lookup failed: {e}")
+        return None
+
+    if len(rows) < min_results:
+        return None
+
+    return [
+        Product(
+            platform=platform,
+            name=name,
+            quantity=quantity,
+            price=format_price(paise),
+            product_url=url,
+            image_url=image_url,
+            in_stock=bool(in_stock),
+        )
+        for platform, name, quantity, paise, url, image_url, in_stock in rows
+    ]
+
+
+def find_product(product_id=None, platform=None, product_key=None):
+    """Look up a platform product by id, or by platform + product URL/key."""
+    sql = """
+        SELECT id, platform, name, quantity, product_url, image_url,
+               last_price_paise, last_in_stock, first_seen, last_seen
+          FROM platform_products
+    """
+    with read_conn() as conn:
+        if product_id is not None:
+            row = conn.execute(sql + " WHERE id = ?", (product_id,)).fetchone()
+        else:
+            row = conn.execute(sql + " WHERE platform = ? AND product_key = ?",
+                               (platform, product_key)).fetchone()
+    if not row:
+        return None
+    keys = ("id", "platform", "name", "quantity", "product_url", "image_url",
+            "last_price_paise", "last_in_stock", "first_seen", "last_seen")
+    return dict(zip(keys, row))
+
+
+def get_price_series(product_id, since, until=None, resolution="daily"):
+    """
+    Rolled-up price series for one platform product, oldest first.
+    Buckets exist only where the price changed (observations are
+    change-only), so callers should carry the last value forward.
+    """
+    if resolution not in ROLLUPS:
+        raise ValueError(f"Unknown resolution: {resolution}")
+    with read_conn() as conn:
+        rows = conn.execute(f"""
+            SELECT bucket, min_paise, max_paise, last_paise
+              FROM price_rollup_{resolution}
+             WHERE product_id = ? AND bucket >= ? AND bucket <= ?
+             ORDER BY bucket
+        """, (product_id, since - since % ROLLUPS[resolution], until or int(time.time()))).fetchall()
+    return [
+        {"t": bucket, "min": lo / 100, "max": hi / 100, "last": last / 100}
+        for bucket, lo, hi, last in rows
+    ]
+
+
+# --------------------------------------------------------------------------------------
+#                              B A C K G R O U N D   W R I T E R
+# --------------------------------------------------------------------------------------
+class ProductWriter(threading.Thread):
+    """
+    Single background thread that owns the write connection.
+    Request threads hand over product lists through a bounded queue; the
+    writer coalesces rows from many searches into one executemany
+    transaction, recording an observation only when price or stock
+    changed. When the queue is full, rows are dropped and counted rather
+    than blocking a request.
+    """
+
+    def __init__(self, db_name=DB_NAME, queue_size=WRITE_QUEUE_SIZE,
+                 batch_rows=WRITE_BATCH_ROWS, flush_interval=WRITE_FLUSH_INTERVAL):
+        super().__init__(name="product-writer", daemon=True)
+        self.db_name = db_name
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._sentinel = object()
+
+        self.written_rows = 0
+        self.observations = 0
+        self.dropped_rows = 0
+        self.failed_rows = 0
+        self.batches = 0
+        self.last_batch_ms = 0.0
+
+    def submit(self, products, location_key=None) -> bool:
+        """Queue products for writing; never blocks. Returns False if dropped."""
+        if not products:
+            return True
+        try:
+            self._queue.put_nowait((int(time.time()), location_key, products))
+            return True
+        except queue.Full:
+            self.dropped_rows += len(products)
+            logger.warning(f"DB write queue full, dropped {len(products)} rows")
+            return False
+
+    def run(self):
+        conn = connect(self.db_name)
+        try:
+            while True:
+                rows, stopping = self._collect()
+                if rows:
+                    self._write(conn, rows)
+                if stopping:
+                    break
+        finally:
+            conn.close()
+
+    def _collect(self):
+        """Block for the first batch, then drain whatever else is queued (up to batch_rows)."""
+        rows = []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return rows, False
+
+        while True:
+            if item is self._sentinel:
+                return rows, True
+            observed_at, location_key, products = item
+            for p in products:
+                try:
+                    rows.append(product_row(p, observed_at, location_key))
+                except Exception as e:
+                    self.failed_rows += 1
+                    logger.debug(f"Unserialisable product skipped: {e}")
+            if len(rows) >= self.batch_rows:
+                return rows, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return rows, False
+
+    def _write(self, conn, rows):
+        start = time.perf_counter()
+        try:
+            with conn:
+                observations = record_products(conn, rows)
+            self.written_rows += len(rows)
+            self.observations += observations
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.failed_rows += len(rows)
+            logger.error(f"DB batch write failed ({len(rows)} rows): {e}")
+        self.last_batch_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    def stop(self, timeout=5):
+        """Flush what is queued and stop the thread."""
+        if self.is_alive():
+            self._queue.put(self._sentinel)
+            self.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "written_rows": self.written_rows,
+            "observations": self.observations,
+            "dropped_rows": self.dropped_rows,
+            "failed_rows": self.failed_rows,
+            "batches": self.batches,
+            "last_batch_ms": self.last_batch_ms,
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> ProductWriter:
+    """Return the process-wide product writer, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ProductWriter()
+                _writer.start()
+                atexit.register(_writer.stop)
+    return _writer
+
+
 if __name__ == "__main__":
     init_db()
-    print("✅ Database initialized")
\ No newline at end of file
+    print("✅ Database initialized")
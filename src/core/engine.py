@@ -0,0 +1,183 @@
+# engine.py
+"""
+Platform fetch engine
+One long-lived asyncio event loop, running in a daemon thread, drives every
+platform fetch for the app. Flask request threads hand it coroutines and wait
+on the result, instead of each request building its own thread pool.
+
+Coroutine functions run natively on the loop. Platform calls that are still
+blocking (cloudscraper, requests, sync Playwright) are offloaded to a single
+shared, bounded executor so threads are reused across requests.
+"""
+
+import asyncio
+import atexit
+import contextvars
+import functools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core import retry
+from src.core.scheduler import Saturated
+
+logger = logging.getLogger(__name__)
+
+# Threads available for blocking platform calls, shared by all requests
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "32"))
+
+
+class FetchEngine:
+    """Owns the event loop thread and the shared blocking-call executor."""
+
+    def __init__(self, workers: int = ENGINE_WORKERS):
+        self.workers = workers
+        self.loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch")
+        self.loop.set_default_executor(self._executor)
+        self._thread = threading.Thread(target=self._run_loop, name="fetch-engine", daemon=True)
+        self._started = threading.Event()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._started.set)
+        self.loop.run_forever()
+
+    def start(self):
+        if not self._thread.is_alive():
+            self._thread.start()
+            self._started.wait()
+            logger.debug(f"Fetch engine started ({self.workers} blocking workers)")
+        return self
+
+    def stop(self):
+        if self._thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ------------------------------------------------------------------
+    # Bridging from sync (Flask) code
+    # ------------------------------------------------------------------
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: float = None):
+        """Run a coroutine on the engine loop and block until it finishes."""
+        return self.submit(coro).result(timeout=timeout)
+
+    # ------------------------------------------------------------------
+    # Helpers for coroutines running on the loop
+    # ------------------------------------------------------------------
+    async def call(self, fn, *args, **kwargs):
+        """Await fn(*args) - natively if it is a coroutine function, else in the executor."""
+        if asyncio.iscoroutinefunction(fn):
+            return await fn(*args, **kwargs)
+        # Carry context variables (e.g. the retry deadline) into the worker thread
+        ctx = contextvars.copy_context()
+        return await self.loop.run_in_executor(None, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> FetchEngine:
+    """Return the process-wide engine, starting it on first use."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = FetchEngine().start()
+                atexit.register(_engine.stop)
+    return _engine
+
+
+# ----------------------------------------------------------------------
+# Deadline-bounded fan-out
+# ----------------------------------------------------------------------
+STATUS_OK = "ok"
+STATUS_TIMEOUT = "timeout"
+STATUS_ERROR = "error"
+STATUS_SKIPPED = "skipped"
+STATUS_REJECTED = "rejected"
+
+
+def _outcome(task):
+    """(status, value) for a finished task."""
+    if task.cancelled():
+        return STATUS_TIMEOUT, None
+    exc = task.exception()
+    if exc is None:
+        return STATUS_OK, task.result()
+    if isinstance(exc, asyncio.TimeoutError):
+        return STATUS_TIMEOUT, None
+    if isinstance(exc, Saturated):
+        return STATUS_REJECTED, exc
+    return STATUS_ERROR, exc
+
+
+async def _within(coro, timeout):
+    # Runs in its own task context, so the deadline only applies to this call.
+    # It only stops retries: the first attempt keeps the platform's own timeout,
+    # so a call that misses the deadline can still finish and reach on_late.
+    retry.limit_retries(timeout)
+    return await coro
+
+
+async def gather_with_deadline(calls: dict, timeout: float, on_late=None, on_done=None,
+                               cancel_pending: bool = False) -> dict:
+    """
+    Await every coroutine in `calls` ({name: coro}) together against one deadline.
+
+    Returns {name: (status, value)} where status is ok / timeout / error /
+    rejected and value is the result (ok), the exception (error, rejected)
+    or None (timeout).
+    If given, on_done(name, status, value) is called on the loop as each
+    call finishes within the deadline, so callers can stream progress.
+    Calls still running at the deadline keep going in the background; when
+    one finishes, on_late(name, status, value) is run in the executor so the
+    result can still be cached. With cancel_pending they are cancelled
+    instead (a blocking call already handed to the executor still finishes).
+    """
+    loop = asyncio.get_running_loop()
+    tasks = {name: asyncio.ensure_future(_within(coro, timeout)) for name, coro in calls.items()}
+    if not tasks:
+        return {}
+
+    # Tasks that missed the deadline are reported through on_late, not on_done
+    expired = set()
+    if on_done:
+        for name, task in tasks.items():
+            task.add_done_callback(
+                lambda t, name=name: None if t in expired else on_done(name, *_outcome(t))
+            )
+
+    await asyncio.wait(tasks.values(), timeout=max(0.0, timeout))
+
+    outcomes = {}
+    for name, task in tasks.items():
+        if task.done():
+            outcomes[name] = _outcome(task)
+            if outcomes[name][0] in (STATUS_ERROR, STATUS_REJECTED):
+                logger.warning(f"{name} failed: {outcomes[name][1]!r}")
+            continue
+
+        expired.add(task)
+        outcomes[name] = (STATUS_TIMEOUT, None)
+        if cancel_pending:
+            task.cancel()
+            continue
+        logger.warning(f"{name} missed the {timeout:.1f}s deadline")
+
+        def finish_late(t, name=name):
+            status, value = _outcome(t)
+            logger.debug(f"{name} finished late ({status})")
+            if on_late:
+                loop.run_in_executor(None, on_late, name, status, value)
+
+        task.add_done_callback(finish_late)
+
+    return outcomes
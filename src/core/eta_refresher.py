@@ -0,0 +1,166 @@
+# eta_refresher.py
+"""
+Background ETA refresher
+Remembers which locations users are actively looking at and re-fetches
+their ETAs on the engine loop shortly before the cached values expire, so
+`/eta` answers from memory instead of making the user wait on a scrape.
+
+- Each (platform, location) is refreshed at ~80% of that platform's ETA TTL,
+  with jitter so zones seen at the same moment do not refresh in lockstep.
+- Each platform has a refresh budget per minute and a small cap on refreshes
+  in flight, so background work never crowds out user requests.
+- Zones with no requests for ETA_ZONE_IDLE seconds are forgotten.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+from src.core import registry
+
+logger = logging.getLogger(__name__)
+
+ETA_REFRESH_ENABLED = os.getenv("ETA_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds without a request before a zone stops being refreshed
+ETA_ZONE_IDLE = float(os.getenv("ETA_ZONE_IDLE", "900"))
+# Seconds between scheduling passes
+ETA_REFRESH_TICK = float(os.getenv("ETA_REFRESH_TICK", "5"))
+# Refresh at this fraction of the platform's ETA TTL, +/- ETA_REFRESH_JITTER of it
+ETA_REFRESH_AT = 0.8
+ETA_REFRESH_JITTER = 0.1
+
+
+def refresh_budget(adapter) -> int:
+    """Background refreshes per minute allowed for a platform (<NAME>_ETA_REFRESH_PER_MIN)."""
+    default = 6 if adapter.resource == "browser" else 30
+    return int(os.getenv(f"{adapter.name.upper()}_ETA_REFRESH_PER_MIN", default))
+
+
+def refresh_concurrency(adapter) -> int:
+    """Background refreshes a platform may have in flight at once."""
+    return 1 if adapter.resource == "browser" else 4
+
+
+class EtaRefresher:
+    """Tracks active zones and keeps their cached ETAs warm."""
+
+    def __init__(self, engine, on_result, idle=ETA_ZONE_IDLE, tick=ETA_REFRESH_TICK):
+        self.engine = engine
+        self.on_result = on_result      # on_result(eta_key, platform, eta)
+        self.idle = idle
+        self.tick = tick
+
+        self._lock = threading.Lock()
+        self._zones = {}                # eta_key -> (location, last_active)
+        self._due = {}                  # (platform, eta_key) -> monotonic time
+        self._spent = {}                # platform -> [start of minute, refreshes]
+        self._in_flight = {}            # platform -> refreshes running
+
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+        self.expired_zones = 0
+
+    def _next_due(self, adapter, now):
+        ttl = adapter.eta_ttl
+        return now + ttl * (ETA_REFRESH_AT + random.uniform(-ETA_REFRESH_JITTER, ETA_REFRESH_JITTER))
+
+    def touch(self, eta_key, location):
+        """Mark a location as active (called from request threads)."""
+        now = time.monotonic()
+        with self._lock:
+            new = eta_key not in self._zones
+            self._zones[eta_key] = (dict(location), now)
+            if new:
+                # The request itself fetches fresh ETAs; schedule the first refresh
+                for adapter in registry.adapters("eta"):
+                    self._due[(adapter.name, eta_key)] = self._next_due(adapter, now)
+
+    def _take_budget(self, adapter, now) -> bool:
+        window = self._spent.setdefault(adapter.name, [now, 0])
+        if now - window[0] >= 60:
+            window[0], window[1] = now, 0
+        if window[1] >= refresh_budget(adapter):
+            return False
+        window[1] += 1
+        return True
+
+    def _due_work(self):
+        """Drop idle zones and pick the due refreshes each platform has room and budget for."""
+        now = time.monotonic()
+        work = []
+        with self._lock:
+            for eta_key, (_, last_active) in list(self._zones.items()):
+                if now - last_active > self.idle:
+                    del self._zones[eta_key]
+                    self.expired_zones += 1
+                    for adapter in registry.adapters("eta"):
+                        self._due.pop((adapter.name, eta_key), None)
+
+            for adapter in registry.adapters("eta"):
+                room = refresh_concurrency(adapter) - self._in_flight.get(adapter.name, 0)
+                due = sorted((t, key) for (name, key), t in self._due.items()
+                             if name == adapter.name and t <= now)
+                for _, eta_key in due[:max(0, room)]:
+                    if not self._take_budget(adapter, now):
+                        # Stays due; picked up once the budget window resets
+                        self.deferred += 1
+                        break
+                    self._in_flight[adapter.name] = self._in_flight.get(adapter.name, 0) + 1
+                    self._due[(adapter.name, eta_key)] = self._next_due(adapter, now)
+                    work.append((adapter, eta_key, self._zones[eta_key][0]))
+        return work
+
+    async def _refresh(self, adapter, eta_key, location):
+        try:
+            value = await adapter.eta(self.engine, location)
+        except Exception as e:
+            value = None
+            logger.debug(f"Background {adapter.name} ETA refresh for {eta_key} failed: {e!r}")
+        finally:
+            with self._lock:
+                self._in_flight[adapter.name] -= 1
+
+        # Keep the previous good value rather than overwrite it with a failure
+        if value and value != "N/A":
+            self.refreshed += 1
+            await self.engine.loop.run_in_executor(None, self.on_result, eta_key, adapter.name, value)
+        else:
+            self.failed += 1
+
+    async def run(self):
+        logger.info("ETA refresher started")
+        while True:
+            for adapter, eta_key, location in self._due_work():
+                asyncio.ensure_future(self._refresh(adapter, eta_key, location))
+            await asyncio.sleep(self.tick)
+
+    def stats(self) -> dict:
+        with self._lock:
+            zones = len(self._zones)
+        return {
+            "active_zones": zones,
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+            "expired_zones": self.expired_zones,
+        }
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def start_refresher(engine, on_result):
+    """Start the process-wide refresher on the engine loop. Returns None when disabled."""
+    global _refresher
+    if not ETA_REFRESH_ENABLED:
+        return None
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = EtaRefresher(engine, on_result)
+            engine.submit(_refresher.run())
+    return _refresher
@@ -0,0 +1,235 @@
+# export.py
+"""
+Streaming bulk export of price observations
+Rows are read from SQLite in fixed-size chunks with keyset pagination on the
+observation id (`id > cursor ORDER BY id LIMIT n`), so memory stays constant
+and no read transaction is held open for the whole export. Each chunk is
+encoded and yielded straight away as CSV, JSON Lines or, when pyarrow is
+installed, Arrow IPC stream batches.
+
+Usage from the command line:
+    python src/core/export.py --format csv --platform blinkit --since 1700000000 > prices.csv
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+
+try:
+    from src.core import jsonio
+    from src.core.db import DB_NAME, connect
+except ImportError:
+    # When running directly, add project root to path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import jsonio
+    from src.core.db import DB_NAME, connect
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "5000"))
+
+COLUMNS = ("observation_id", "platform", "product_key", "name", "quantity",
+           "product_url", "price_paise", "in_stock", "observed_at")
+
+FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def available_formats():
+    return [f for f in FORMATS if f != "arrow" or pa is not None]
+
+
+class ExportFilter:
+    """Platform / time-range filter shared by the row query and the page-end lookup."""
+
+    def __init__(self, platform=None, since=None, until=None):
+        clauses, params = [], {}
+        if platform:
+            clauses.append("p.platform = :platform")
+            params["platform"] = platform
+        if since is not None:
+            clauses.append("o.observed_at >= :since")
+            params["since"] = since
+        if until is not None:
+            clauses.append("o.observed_at < :until")
+            params["until"] = until
+        self.sql = "".join(f" AND {c}" for c in clauses)
+        self.params = params
+
+
+_FROM = """
+      FROM price_observations o
+      JOIN platform_products p ON p.id = o.product_id
+     WHERE o.id > :after
+"""
+
+
+def page_end(conn, flt, after=0, limit=None):
+    """
+    Last observation id of the page of `limit` rows after `after`, and whether
+    more rows follow it. The end id doubles as the next pagination token.
+    (None, False) when the page is unbounded.
+    """
+    if not limit:
+        return None, False
+    params = dict(flt.params, after=after, offset=limit - 1)
+    row = conn.execute(
+        f"SELECT o.id {_FROM} {flt.sql} ORDER BY o.id LIMIT 1 OFFSET :offset", params
+    ).fetchone()
+    if row is None:
+        return None, False
+    more = conn.execute(
+        f"SELECT 1 {_FROM} {flt.sql} LIMIT 1", dict(flt.params, after=row[0])
+    ).fetchone()
+    return row[0], more is not None
+
+
+def iter_chunks(flt, after=0, end_id=None, limit=None, chunk_rows=EXPORT_CHUNK_ROWS, db_name=DB_NAME):
+    """
+    Yield lists of row tuples (in COLUMNS order) after `after`, up to and
+    including `end_id`, and at most `limit` rows in total. The limit is
+    applied in the query itself, so a page stays bounded even without an
+    end id (rows written after page_end ran are not swept in).
+    """
+    sql = f"""
+        SELECT o.id, p.platform, p.product_key, p.name, p.quantity,
+               p.product_url, o.price_paise, o.in_stock, o.observed_at
+        {_FROM} {flt.sql} {"AND o.id <= :end_id" if end_id is not None else ""}
+         ORDER BY o.id LIMIT :chunk
+    """
+    conn = connect(db_name)
+    try:
+        while limit is None or limit > 0:
+            chunk = chunk_rows if limit is None else min(chunk_rows, limit)
+            params = dict(flt.params, after=after, chunk=chunk)
+            if end_id is not None:
+                params["end_id"] = end_id
+            rows = conn.execute(sql, params).fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < chunk:
+                return
+            after = rows[-1][0]
+            if limit is not None:
+                limit -= len(rows)
+    finally:
+        conn.close()
+
+
+# --------------------------------------------------------------------------------------
+#                                   E N C O D E R S
+# --------------------------------------------------------------------------------------
+def encode_csv(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def encode_jsonl(chunks):
+    for rows in chunks:
+        yield "".join(jsonio.dumps(dict(zip(COLUMNS, row))) + "\n" for row in rows)
+
+
+class _Drain:
+    """Write-only file object that hands pyarrow's output back in pieces."""
+
+    def __init__(self):
+        self.parts = []
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data, self.parts = b"".join(self.parts), []
+        return data
+
+
+def encode_arrow(chunks):
+    if pa is None:
+        raise RuntimeError("Arrow export needs pyarrow (pip install pyarrow)")
+    schema = pa.schema([
+        ("observation_id", pa.int64()), ("platform", pa.string()), ("product_key", pa.string()),
+        ("name", pa.string()), ("quantity", pa.string()), ("product_url", pa.string()),
+        ("price_paise", pa.int64()), ("in_stock", pa.bool_()), ("observed_at", pa.int64()),
+    ])
+    sink = _Drain()
+    writer = pa.ipc.new_stream(sink, schema)
+    for rows in chunks:
+        columns = list(zip(*rows))
+        columns[7] = [bool(v) for v in columns[7]]
+        writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(columns, schema)],
+                                           schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+ENCODERS = {"csv": encode_csv, "jsonl": encode_jsonl, "arrow": encode_arrow}
+
+
+def export(fmt, platform=None, since=None, until=None, after=0, limit=None, db_name=DB_NAME):
+    """
+    Prepare one export page. Returns (chunk generator, next cursor or None).
+    Without a limit the whole filtered range after `after` is streamed.
+    """
+    flt = ExportFilter(platform, since, until)
+    conn = connect(db_name)
+    try:
+        end_id, more = page_end(conn, flt, after, limit)
+    finally:
+        conn.close()
+    chunks = iter_chunks(flt, after, end_id, limit=limit or None, db_name=db_name)
+    return ENCODERS[fmt](chunks), (end_id if more else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream price observations out of product.db")
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--platform")
+    parser.add_argument("--since", type=int, help="unix timestamp (inclusive)")
+    parser.add_argument("--until", type=int, help="unix timestamp (exclusive)")
+    parser.add_argument("--after", type=int, default=0, help="resume after this observation id")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--out", help="output file (default: stdout)")
+    args = parser.parse_args(argv)
+
+    body, _ = export(args.format, args.platform, args.since, args.until, args.after, db_name=args.db)
+    binary = args.format == "arrow"
+    if args.out:
+        out = open(args.out, "wb") if binary else open(args.out, "w", newline="", encoding="utf-8")
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+    try:
+        for piece in body:
+            out.write(piece)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# jsonio.py
+"""
+JSON in and out, with orjson when it is installed
+Platform payloads are large nested documents (Blinkit snippets, Zepto
+layout widgets, Instamart search trees, DMart products with sKUs), and the
+merged search results are the largest thing the app encodes. orjson parses
+and serializes both several times faster than the json module; without it
+every call here falls back to the stdlib with the same results.
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from src.core.product import json_default
+
+HAVE_ORJSON = orjson is not None
+# Stats and status maps may be keyed by non-strings; the stdlib accepts those too
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if HAVE_ORJSON else 0
+
+
+def loads(data):
+    """Parse a JSON document given as bytes or str."""
+    if HAVE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumpb(obj, default=json_default) -> bytes:
+    """Compact UTF-8 JSON bytes; `default` encodes types JSON does not know."""
+    if HAVE_ORJSON:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def dumps(obj, default=json_default) -> str:
+    """Compact JSON text (non-ASCII kept as is)."""
+    if HAVE_ORJSON:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":"))
+
+
+def parse_response(response):
+    """Parsed body of a requests / cloudscraper or Playwright response."""
+    body = getattr(response, "content", None)
+    if body is None:
+        # Playwright responses expose the raw body through a method
+        body = response.body()
+    return loads(body)
@@ -0,0 +1,61 @@
+# latency.py
+"""
+Rolling latency percentiles per platform
+Each PlatformAdapter keeps one tracker per call kind (search, eta) fed with
+the durations of successful calls. The trackers turn the observed p99 into
+the call's timeout (the configured timeout stays the ceiling) and give the
+p95 after which a hedged duplicate request is worth sending.
+"""
+
+import math
+import os
+from collections import deque
+
+ADAPTIVE_TIMEOUTS = os.getenv("ADAPTIVE_TIMEOUTS", "true").lower() in ("1", "true", "yes")
+# Recent successful calls kept per tracker
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+# Below this many samples the configured timeouts are used as-is
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))
+# Adaptive timeout = p99 x factor, never below the floor or above the configured timeout
+TIMEOUT_P99_FACTOR = float(os.getenv("TIMEOUT_P99_FACTOR", "2.0"))
+TIMEOUT_FLOOR = float(os.getenv("TIMEOUT_FLOOR", "3"))
+
+
+class LatencyTracker:
+    """Sliding window of call durations (seconds) with nearest-rank percentiles."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def percentile(self, p: float):
+        """p-th percentile of the window, or None until LATENCY_MIN_SAMPLES are in."""
+        if len(self._samples) < LATENCY_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+    def timeout(self, ceiling: float) -> float:
+        """Timeout derived from the observed p99, capped by the configured `ceiling`."""
+        p99 = self.percentile(99) if ADAPTIVE_TIMEOUTS else None
+        if p99 is None:
+            return ceiling
+        return min(ceiling, max(TIMEOUT_FLOOR, p99 * TIMEOUT_P99_FACTOR))
+
+    def stats(self, ceiling: float = None) -> dict:
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+        out = {
+            "samples": len(self._samples),
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+        }
+        if ceiling is not None:
+            out["timeout_s"] = round(self.timeout(ceiling), 2)
+        return out
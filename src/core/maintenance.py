@@ -0,0 +1,201 @@
+# maintenance.py
+"""
+Retention and compaction for product.db
+Runs on a timer in a background thread (or once from the command line):
+
+1. Raw price observations older than the retention window are deleted.
+   Their history is already folded into the hourly/daily rollups by the
+   triggers in db.py, so nothing is lost at daily resolution.
+2. Hourly rollups and per-location catalog entries get their own, shorter
+   retention windows. Daily rollups are kept unless configured otherwise.
+3. Freed pages are returned with incremental vacuum, then statistics are
+   refreshed with a bounded ANALYZE.
+
+Every step works in small batches, each in its own short transaction with
+a pause in between, so the background product writer never waits on the
+write lock for more than a few milliseconds.
+"""
+
+import logging
+import os
+import threading
+import time
+
+try:
+    from src.core.db import DB_NAME, connect
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core.db import DB_NAME, connect
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# Retention windows in days (0 = keep forever)
+OBSERVATION_RETENTION_DAYS = int(os.getenv("OBSERVATION_RETENTION_DAYS", "90"))
+HOURLY_ROLLUP_RETENTION_DAYS = int(os.getenv("HOURLY_ROLLUP_RETENTION_DAYS", "30"))
+DAILY_ROLLUP_RETENTION_DAYS = int(os.getenv("DAILY_ROLLUP_RETENTION_DAYS", "0"))
+CATALOG_RETENTION_DAYS = int(os.getenv("CATALOG_RETENTION_DAYS", "14"))
+
+# Batching: rows per delete transaction, pages per vacuum step, pause between
+MAINTENANCE_BATCH_ROWS = int(os.getenv("MAINTENANCE_BATCH_ROWS", "500"))
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "256"))
+MAINTENANCE_PAUSE = float(os.getenv("MAINTENANCE_PAUSE", "0.05"))
+# Seconds between runs (0 disables the background job)
+MAINTENANCE_INTERVAL = int(os.getenv("MAINTENANCE_INTERVAL", str(6 * 3600)))
+
+# (table, delete-batch SQL, retention days). Each SQL deletes at most ?2 rows older than ?1.
+RETENTION_STEPS = [
+    ("price_observations", """
+        DELETE FROM price_observations WHERE id IN (
+            SELECT id FROM price_observations WHERE observed_at < ?1 ORDER BY id LIMIT ?2)
+    """, OBSERVATION_RETENTION_DAYS),
+    ("price_rollup_hourly", """
+        DELETE FROM price_rollup_hourly WHERE (product_id, bucket) IN (
+            SELECT product_id, bucket FROM price_rollup_hourly WHERE bucket < ?1 LIMIT ?2)
+    """, HOURLY_ROLLUP_RETENTION_DAYS),
+    ("price_rollup_daily", """
+        DELETE FROM price_rollup_daily WHERE (product_id, bucket) IN (
+            SELECT product_id, bucket FROM price_rollup_daily WHERE bucket < ?1 LIMIT ?2)
+    """, DAILY_ROLLUP_RETENTION_DAYS),
+    ("catalog_entries", """
+        DELETE FROM catalog_entries WHERE (product_id, location_key) IN (
+            SELECT product_id, location_key FROM catalog_entries WHERE last_seen < ?1 LIMIT ?2)
+    """, CATALOG_RETENTION_DAYS),
+]
+
+
+def _delete_in_batches(conn, sql, cutoff, batch_rows, pause):
+    deleted = 0
+    while True:
+        with conn:
+            n = conn.execute(sql, (cutoff, batch_rows)).rowcount
+        deleted += n
+        if n < batch_rows:
+            return deleted
+        time.sleep(pause)
+
+
+def _incremental_vacuum(conn, pages, pause, max_steps=200):
+    """Release free pages a few at a time. Needs auto_vacuum=INCREMENTAL (see enable_incremental_vacuum)."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    for _ in range(max_steps):
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            break
+        conn.execute(f"PRAGMA incremental_vacuum({pages})").fetchall()
+        freed += min(free, pages)
+        time.sleep(pause)
+    return freed
+
+
+def run_maintenance(db_name=DB_NAME, batch_rows=MAINTENANCE_BATCH_ROWS,
+                    vacuum_pages=MAINTENANCE_VACUUM_PAGES, pause=MAINTENANCE_PAUSE):
+    """One retention + compaction pass. Safe to run while the server is live."""
+    start = time.time()
+    summary = {"deleted": {}, "freed_pages": 0}
+    conn = connect(db_name)
+    try:
+        for table, sql, days in RETENTION_STEPS:
+            if days <= 0:
+                continue
+            cutoff = int(start) - days * DAY
+            summary["deleted"][table] = _delete_in_batches(conn, sql, cutoff, batch_rows, pause)
+
+        summary["freed_pages"] = _incremental_vacuum(conn, vacuum_pages, pause)
+
+        # Bounded ANALYZE: samples at most ~1000 rows per index
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)")
+    finally:
+        conn.close()
+
+    summary["duration_s"] = round(time.time() - start, 2)
+    summary["finished_at"] = int(time.time())
+    logger.info(f"DB maintenance done: {summary}")
+    return summary
+
+
+def enable_incremental_vacuum(db_name=DB_NAME):
+    """
+    Switch an existing database to auto_vacuum=INCREMENTAL. This takes one
+    full VACUUM, which rewrites the file and holds the write lock throughout,
+    so run it once from the command line, ideally with the server stopped.
+    Returns True if the mode was changed.
+    """
+    conn = connect(db_name)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        logger.info(f"Switching {db_name} to incremental auto-vacuum (full VACUUM)")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+class MaintenanceJob(threading.Thread):
+    """Runs run_maintenance every `interval` seconds until stopped."""
+
+    def __init__(self, db_name=DB_NAME, interval=MAINTENANCE_INTERVAL):
+        super().__init__(name="db-maintenance", daemon=True)
+        self.db_name = db_name
+        self.interval = interval
+        self.last_summary = None
+        self.last_error = None
+        self._wake = threading.Event()
+
+    def run(self):
+        while not self._wake.wait(self.interval):
+            try:
+                self.last_summary = run_maintenance(self.db_name)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = repr(e)
+                logger.error(f"DB maintenance failed: {e}")
+
+    def stop(self):
+        self._wake.set()
+
+    def stats(self) -> dict:
+        return {
+            "interval_s": self.interval,
+            "last_run": self.last_summary,
+            "last_error": self.last_error,
+        }
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start_maintenance():
+    """Start the background job once per process. Returns None when disabled."""
+    global _job
+    if MAINTENANCE_INTERVAL <= 0:
+        return None
+    with _job_lock:
+        if _job is None:
+            _job = MaintenanceJob()
+            _job.start()
+    return _job
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run one retention + compaction pass on product.db")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="first switch an existing database to incremental auto-vacuum (one full VACUUM)")
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        print("Switched to incremental auto-vacuum" if enable_incremental_vacuum()
+              else "Already using incremental auto-vacuum")
+    print(run_maintenance())
@@ -0,0 +1,156 @@
+# platforms.py
+"""
+Built-in platform adapters
+Wires each scraper and ETA helper into the registry with its capabilities
+and limits. Adding a platform means adding one register() call here.
+
+Search wrappers accept an optional `on_eta(platform, eta)` callback; scrapers
+whose payloads already carry the delivery ETA report it there, so the app can
+fill its ETA cache without a separate ETA call.
+"""
+
+import contextvars
+import functools
+import os
+
+from src.core import registry, scheduler
+from src.core.engine import get_engine
+from src.core.registry import PlatformAdapter
+
+# --- Product scrapers ---
+from src.scrapers.blinkit_scraper import run_scraper, DEFAULT_MAX_PRODUCTS, DEFAULT_PAGE_SIZE
+from src.scrapers.zepto_scraper import run_zepto_scraper
+from src.scrapers.dmart_scraper import run_dmart_scraper
+from src.scrapers.instamart_scraper import run_instamart_scraper
+from src.scrapers.dmart_location import get_store_details
+from src.core.geocoding import geocode_address, geohash
+
+# --- ETA helpers ---
+from src.eta.eta_blinkit import get_blinkit_eta
+from src.eta.eta_zepto import lookup_zepto_eta, get_zepto_eta_from_ui
+from src.eta.eta_dmart import get_dmart_eta
+from src.eta.eta_instamart import get_instamart_eta
+
+
+def _eta_hook(on_eta, platform):
+    """Bind the app's on_eta(platform, eta) callback for a scraper that can report ETAs."""
+    return functools.partial(on_eta, platform) if on_eta else None
+
+
+def _engine_pages(platform):
+    """
+    fetch_pages runner for a blocking scraper: each follow-up page runs on the
+    shared engine with its own resource slot and rate-limit token, in a copy
+    of the caller's context (so it keeps the deadlines).
+    """
+    def fetch_pages(fetchers):
+        engine, adapter = get_engine(), registry.get(platform)
+        futures = [
+            engine.submit(adapter.extra_call(engine, contextvars.copy_context().run, fetch))
+            for fetch in fetchers
+        ]
+        pages = []
+        for future in futures:
+            try:
+                pages.append(future.result())
+            except Exception:
+                # Out of slots or failed: the pages so far still count
+                pages.append(None)
+        return pages
+    return fetch_pages
+
+
+def blinkit_search(query, location, max_products=DEFAULT_MAX_PRODUCTS, page_size=DEFAULT_PAGE_SIZE,
+                   on_eta=None, **_):
+    return run_scraper(query, max_products, page_size, on_eta=_eta_hook(on_eta, "blinkit"),
+                       fetch_pages=_engine_pages("blinkit"))
+
+
+async def zepto_search(query, location, **_):
+    # Async Playwright: runs on the engine loop in the shared browser
+    return await run_zepto_scraper(query)
+
+
+async def zepto_eta(location):
+    # The memo / serviceability path holds an HTTP slot (see eta_resource below);
+    # only the location-picker fallback takes a browser slot
+    engine = get_engine()
+    eta = await engine.call(lookup_zepto_eta, location["address"])
+    if eta:
+        return eta
+    return await registry.get("zepto").extra_call(
+        engine, get_zepto_eta_from_ui, location["address"], resource=scheduler.BROWSER)
+
+
+# DMart's client is async, so these run natively on the engine loop
+async def dmart_search(query, location, max_products=DEFAULT_MAX_PRODUCTS, **_):
+    # DMart pages hold products (several SKUs each), so it keeps its own page size
+    unique_id, store_id = await get_store_details(location["pincode"])
+    if not store_id:
+        return []
+    return await run_dmart_scraper(query, store_id, max_products=max_products)
+
+
+async def dmart_eta(location):
+    return await get_dmart_eta(location["pincode"])
+
+
+def instamart_search(query, location, on_eta=None, **_):
+    return run_instamart_scraper(query, location["address"], on_eta=_eta_hook(on_eta, "instamart"))
+
+
+# --- Store keys: which store/cell serves a location (batch ETA dedup) ---
+def blinkit_store_key(location):
+    # get_blinkit_eta always asks for the configured default coordinates
+    return f"{os.getenv('BLINKIT_DEFAULT_LAT', '28.4652382')},{os.getenv('BLINKIT_DEFAULT_LON', '77.0615957')}"
+
+
+def geo_cell_key(location):
+    lat, lng = geocode_address(location["address"])
+    return geohash(lat, lng) if lat is not None and lng is not None else None
+
+
+async def dmart_store_key(location):
+    return (await get_store_details(location["pincode"]))[1] or None
+
+
+registry.register(PlatformAdapter(
+    "blinkit", label="Blinkit",
+    search_fn=blinkit_search,
+    eta_fn=lambda loc: get_blinkit_eta(loc["address"]),
+    capabilities={"http", "hedge"},
+    max_concurrency=16, rate_limit=10,
+    search_timeout=30, eta_timeout=25,
+    eta_ttl=300, store_key_fn=blinkit_store_key,
+))
+
+registry.register(PlatformAdapter(
+    "zepto", label="Zepto",
+    search_fn=zepto_search,
+    eta_fn=zepto_eta,
+    capabilities={"browser"},
+    max_concurrency=3, rate_limit=2,
+    search_timeout=30, eta_timeout=25,
+    eta_ttl=300, store_key_fn=geo_cell_key,
+    eta_resource=scheduler.HTTP,
+))
+
+registry.register(PlatformAdapter(
+    "dmart", label="DMart",
+    search_fn=dmart_search,
+    eta_fn=dmart_eta,
+    capabilities={"http", "store_scoped", "hedge", "needs_pincode"},
+    max_concurrency=16, rate_limit=10,
+    search_timeout=30, eta_timeout=25,
+    eta_ttl=900, store_key_fn=dmart_store_key,
+))
+
+registry.register(PlatformAdapter(
+    "instamart", label="Instamart",
+    search_fn=instamart_search,
+    eta_fn=lambda loc: get_instamart_eta(loc["address"]),
+    capabilities={"browser", "geocoded"},
+    max_concurrency=4, rate_limit=4,
+    search_timeout=30, eta_timeout=20,
+    eta_ttl=300, store_key_fn=geo_cell_key,
+))
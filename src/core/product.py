@@ -0,0 +1,57 @@
+# product.py
+"""
+Product record shared by every scraper
+One small __slots__ object per scraped product, used end to end: scrapers
+build it, the catalog returns it, merge_products groups references to it and
+the JSON layer encodes it straight from its slots. A search holding a few
+thousand products no longer carries a dict (and a copied dict per merged
+offer) for each of them.
+
+Reads through get() / [] still work, so code written against the old
+scraper dicts keeps working unchanged.
+"""
+
+FIELDS = ("platform", "name", "price", "quantity", "image_url",
+          "product_url", "in_stock", "delivery_time")
+
+
+class Product:
+    """One platform's offer for one product."""
+
+    __slots__ = FIELDS
+
+    def __init__(self, platform, name, price="N/A", quantity="", image_url="",
+                 product_url="", in_stock=True, delivery_time=None):
+        self.platform = platform
+        self.name = name
+        self.price = price
+        self.quantity = quantity
+        self.image_url = image_url
+        self.product_url = product_url
+        self.in_stock = in_stock
+        self.delivery_time = delivery_time
+
+    def get(self, field, default=None):
+        """dict.get()-style read; unset (None) fields give `default`."""
+        if field not in FIELDS:
+            return default
+        value = getattr(self, field)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        if field not in FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def __repr__(self):
+        return f"Product({self.platform!r}, {self.name!r}, {self.price!r})"
+
+
+def json_default(obj):
+    """`default=` hook for JSON encoders: Product records encode from their slots."""
+    if isinstance(obj, Product):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
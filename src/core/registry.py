@@ -0,0 +1,287 @@
+# registry.py
+"""
+Platform adapter registry
+Every platform is described once by a PlatformAdapter: what it can do
+(search / eta), and how hard we are allowed to push it (max concurrency,
+rate limit, timeouts). Each adapter owns its own bulkhead, so a slow
+platform can only exhaust its own slots, never another platform's.
+Timeouts follow each platform's observed latency (latency.py), and cheap
+HTTP platforms may hedge slow calls with one duplicate request.
+"""
+
+import asyncio
+import logging
+import os
+import time
+
+from src.core import retry, scheduler
+from src.core.latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+# Hedged duplicates allowed, as a fraction of a platform's calls
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+# Store resolutions (geocodes, store lookups) in flight at once, across platforms
+STORE_KEY_CONCURRENCY = int(os.getenv("STORE_KEY_CONCURRENCY", "8"))
+_store_key_slots = None
+
+
+class RateLimiter:
+    """Async limiter that spaces calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_at = 0.0
+        self._lock = None
+
+    async def wait(self):
+        if not self.interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class PlatformAdapter:
+    """
+    Uniform wrapper around one platform's search and ETA callables.
+
+    `search_fn(query, location, **options)` returns a list of products and
+    `eta_fn(location)` returns an ETA string; either may be None if the
+    platform does not support it. `location` is a dict with at least
+    `address` and `pincode`. Each callable may be a coroutine function (run
+    natively on the engine loop) or a blocking one (run in its executor).
+
+    `store_key_fn(location)` optionally names the store (or coverage cell)
+    that serves a location, so batch ETA lookups can ask once per store.
+
+    `eta_resource` overrides the resource class ETA calls draw from, for a
+    platform whose ETA has a cheap HTTP path in front of a browser fallback
+    (the fallback then takes its browser slot through `extra_call`).
+    """
+
+    def __init__(self, name, label=None, search_fn=None, eta_fn=None,
+                 capabilities=(), max_concurrency=4, rate_limit=None,
+                 search_timeout=30, eta_timeout=25, eta_ttl=300, store_key_fn=None,
+                 eta_resource=None):
+        self.name = name
+        self.label = label or name.title()
+        self.search_fn = search_fn
+        self.eta_fn = eta_fn
+        self.store_key_fn = store_key_fn
+
+        caps = set(capabilities)
+        if search_fn:
+            caps.add("search")
+        if eta_fn:
+            caps.add("eta")
+        self.capabilities = frozenset(caps)
+
+        # Per-platform overrides, e.g. ZEPTO_MAX_CONCURRENCY=2
+        prefix = name.upper()
+        self.max_concurrency = int(os.getenv(f"{prefix}_MAX_CONCURRENCY", max_concurrency))
+        self.rate_limit = float(os.getenv(f"{prefix}_RATE_LIMIT", rate_limit or 0))
+        self.search_timeout = float(os.getenv(f"{prefix}_SEARCH_TIMEOUT", search_timeout))
+        self.eta_timeout = float(os.getenv(f"{prefix}_ETA_TIMEOUT", eta_timeout))
+        # How long a cached ETA stays valid (seconds)
+        self.eta_ttl = float(os.getenv(f"{prefix}_ETA_TTL", eta_ttl))
+
+        # Global resource class this platform draws from (see scheduler.py)
+        self.resource = scheduler.BROWSER if "browser" in self.capabilities else scheduler.HTTP
+        self.resources = {"search": self.resource, "eta": eta_resource or self.resource}
+
+        self._semaphore = None
+        self._limiter = RateLimiter(self.rate_limit)
+        self.in_flight = 0
+
+        # Observed latency drives timeouts and hedging (see latency.py)
+        self.latency = {"search": LatencyTracker(), "eta": LatencyTracker()}
+        self.calls = 0
+        self.hedges = 0
+
+    def supports(self, capability: str) -> bool:
+        return capability in self.capabilities
+
+    async def search(self, engine, query, location, **options):
+        return await self._run(engine, "search", self.search_timeout, self.search_fn, query, location, **options)
+
+    async def eta(self, engine, location):
+        return await self._run(engine, "eta", self.eta_timeout, self.eta_fn, location)
+
+    async def store_key(self, engine, location):
+        """
+        Store serving `location`, or None when it cannot be resolved (no dedup).
+        Resolution is a geocode or a store lookup, not a platform call, so it
+        skips the platform's bulkhead and rate limit; STORE_KEY_CONCURRENCY
+        caps it across all platforms instead.
+        """
+        global _store_key_slots
+        if not self.store_key_fn:
+            return None
+        if _store_key_slots is None:
+            _store_key_slots = asyncio.Semaphore(STORE_KEY_CONCURRENCY)
+        try:
+            async with _store_key_slots:
+                return await engine.call(self.store_key_fn, location)
+        except Exception as e:
+            logger.debug(f"{self.name}: could not resolve store for {location}: {e!r}")
+            return None
+
+    async def extra_call(self, engine, fn, *args, resource=None, **kwargs):
+        """
+        One more upstream request made on behalf of a call that already holds
+        this platform's slot (e.g. a follow-up search page). It takes its own
+        resource slot (may raise Saturated) and rate-limit token, but no
+        second platform slot, which the caller could deadlock waiting on.
+        `resource` defaults to the platform's own class.
+        """
+        pool = scheduler.get_pool(resource or self.resource)
+        await pool.acquire()
+        try:
+            await self._limiter.wait()
+            return await engine.call(fn, *args, **kwargs)
+        finally:
+            pool.release()
+
+    async def _run(self, engine, kind, timeout, fn, *args, **kwargs):
+        """
+        Run fn inside this platform's bulkhead, bounded by its timeout.
+
+        The timeout adapts to the platform's observed p99 (the configured value
+        is the ceiling). Platforms with the "hedge" capability send one duplicate
+        call once the first has run past p95, if a slot is free right away and
+        the hedge budget allows; the first useful answer wins.
+        """
+        tracker = self.latency[kind]
+        timeout = tracker.timeout(timeout)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        # Retries inside the platform call stop at this platform's timeout
+        retry.limit_deadline(timeout)
+
+        resource = self.resources[kind]
+        primary = await self._launch(engine, tracker, resource, fn, args, kwargs, acquire_timeout=timeout)
+        self.calls += 1
+        tasks = [primary]
+
+        hedge_after = tracker.percentile(95) if self.supports("hedge") else None
+        if hedge_after is not None and loop.time() + hedge_after < deadline:
+            await asyncio.wait({primary}, timeout=hedge_after)
+            if not primary.done() and self.hedges < HEDGE_MAX_RATIO * self.calls:
+                hedge = await self._launch(engine, tracker, resource, fn, args, kwargs)
+                if hedge is not None:
+                    self.hedges += 1
+                    tasks.append(hedge)
+
+        return await asyncio.wait_for(self._first_useful(tasks), max(0.0, deadline - loop.time()))
+
+    async def _launch(self, engine, tracker, resource, fn, args, kwargs, acquire_timeout=None):
+        """
+        Take a platform slot and a resource slot, then start fn. Waits for the
+        slots when `acquire_timeout` is given; otherwise only proceeds if both
+        are free right now (returns None if not), as a hedge must never queue.
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if acquire_timeout is not None:
+            await asyncio.wait_for(self._semaphore.acquire(), acquire_timeout)
+        elif self._semaphore.locked():
+            return None
+        else:
+            await self._semaphore.acquire()
+        self.in_flight += 1
+
+        pool = None
+        try:
+            # App-wide cap for this resource class; raises Saturated when full
+            slots = scheduler.get_pool(resource)
+            if acquire_timeout is not None:
+                await slots.acquire()
+            elif not await slots.try_acquire():
+                self._release(None)
+                return None
+            pool = slots
+            await self._limiter.wait()
+            start = time.monotonic()
+            task = asyncio.ensure_future(engine.call(fn, *args, **kwargs))
+        except BaseException:
+            self._release(pool)
+            raise
+
+        def finished(task):
+            # Slots are freed only when the underlying call really finishes, so
+            # a timed-out blocking call still counts against its platform and pool.
+            self._release(pool)
+            if not task.cancelled() and task.exception() is None:
+                tracker.record(time.monotonic() - start)
+
+        task.add_done_callback(finished)
+        return task
+
+    @staticmethod
+    async def _first_useful(tasks):
+        """
+        Result of the first task to succeed with a non-empty value; an empty
+        result only if every task came back empty. Losing tasks keep running
+        in the background (blocking calls cannot be interrupted).
+        """
+        pending, fallback, error = set(tasks), None, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                if task.result() or not pending:
+                    return task.result()
+                fallback = (task.result(),)
+        if fallback is not None:
+            return fallback[0]
+        raise error or asyncio.CancelledError()
+
+    def _release(self, pool):
+        if pool is not None:
+            pool.release()
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "rate_limit": self.rate_limit,
+            "resource": self.resource,
+            "eta_resource": self.resources["eta"],
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "search_latency": self.latency["search"].stats(self.search_timeout),
+            "eta_latency": self.latency["eta"].stats(self.eta_timeout),
+        }
+
+
+_registry = {}
+
+
+def register(adapter: PlatformAdapter) -> PlatformAdapter:
+    """Add (or replace) a platform adapter."""
+    _registry[adapter.name] = adapter
+    logger.debug(f"Registered platform '{adapter.name}' ({', '.join(sorted(adapter.capabilities))})")
+    return adapter
+
+
+def get(name: str):
+    """Return the adapter for `name`, or None."""
+    return _registry.get(name)
+
+
+def adapters(capability: str = None):
+    """All registered adapters (in registration order), optionally filtered by capability."""
+    return [a for a in _registry.values() if capability is None or a.supports(capability)]
@@ -0,0 +1,194 @@
+# retry.py
+"""
+Shared retry policy for upstream platform calls
+Retries only failures that are worth repeating on an idempotent lookup:
+dropped/reset connections and 429 / 5xx answers. Waits use full-jitter
+exponential backoff (or the server's Retry-After), and no retry is started
+if it could not finish before the request's deadline.
+
+Two deadlines travel in context variables, and the fetch engine copies the
+context into its executor threads. PlatformAdapter sets the platform timeout
+with limit_deadline(): it bounds every attempt (remaining() /
+bound_timeout()) and the retries. gather_with_deadline sets the request
+deadline with limit_retries(): it only stops new retries from being
+scheduled, so a first attempt still runs for the full platform timeout and
+can land late in the cache after the response has gone out.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2.0"))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Substrings of transport errors raised by clients without a typed exception (e.g. Playwright)
+_RESET_MARKERS = ("ECONNRESET", "ECONNREFUSED", "socket hang up", "Connection reset", "Connection aborted")
+
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+_retry_deadline = contextvars.ContextVar("retry_deadline", default=None)
+
+
+class UpstreamError(Exception):
+    """A platform call failed; the caller must not treat it as an empty result."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+# --------------------------------------------------------------------------------------
+#                                   D E A D L I N E
+# --------------------------------------------------------------------------------------
+def _narrow(var, seconds):
+    at = time.monotonic() + seconds
+    current = var.get()
+    if current is None or at < current:
+        var.set(at)
+
+
+def limit_deadline(seconds: float):
+    """Narrow the current context's deadline to at most `seconds` from now."""
+    _narrow(_deadline, seconds)
+
+
+def limit_retries(seconds: float):
+    """Schedule no retry in the current context later than `seconds` from now."""
+    _narrow(_retry_deadline, seconds)
+
+
+def remaining(default=None):
+    """Seconds left before the deadline (may be <= 0), or `default` if none is set."""
+    at = _deadline.get()
+    return default if at is None else at - time.monotonic()
+
+
+def _retry_remaining():
+    """Seconds left for retries: the earlier of the two deadlines, or None."""
+    ats = [at for at in (_deadline.get(), _retry_deadline.get()) if at is not None]
+    return min(ats) - time.monotonic() if ats else None
+
+
+def bound_timeout(timeout: float) -> float:
+    """Per-attempt timeout clipped to the time left (at least 0.1s)."""
+    left = remaining()
+    return timeout if left is None else max(0.1, min(timeout, left))
+
+
+# --------------------------------------------------------------------------------------
+#                                   R E T R Y
+# --------------------------------------------------------------------------------------
+def status_of(response):
+    """HTTP status of a requests / cloudscraper / Playwright response."""
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(response, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable_error(exc: BaseException) -> bool:
+    if isinstance(exc, UpstreamError):
+        return exc.status in RETRYABLE_STATUS
+    if isinstance(exc, ConnectionError):
+        return True
+    try:
+        import requests
+        if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError)):
+            return True
+        if isinstance(exc, requests.exceptions.HTTPError) and exc.response is not None:
+            return exc.response.status_code in RETRYABLE_STATUS
+    except ImportError:
+        pass
+    try:
+        import httpx
+        if isinstance(exc, (httpx.NetworkError, httpx.RemoteProtocolError)):
+            return True
+        if isinstance(exc, httpx.HTTPStatusError):
+            return exc.response.status_code in RETRYABLE_STATUS
+    except ImportError:
+        pass
+    return any(marker in str(exc) for marker in _RESET_MARKERS)
+
+
+def _retry_after(response):
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After") or headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt, attempts, hint=None):
+    """Seconds to wait before the next attempt; None if out of attempts or out of time."""
+    if attempt + 1 >= attempts or (hint is not None and hint > RETRY_MAX_DELAY):
+        return None
+    delay = hint if hint is not None else random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+    left = _retry_remaining()
+    # Leave room for the retry itself, not just the wait
+    if left is not None and delay + RETRY_BASE_DELAY >= left:
+        return None
+    return delay
+
+
+def _backoff(attempt, attempts, hint=None):
+    """Sleep before the next attempt; False if out of attempts or out of time."""
+    delay = _backoff_delay(attempt, attempts, hint)
+    if delay is None:
+        return False
+    time.sleep(delay)
+    return True
+
+
+async def _abackoff(attempt, attempts, hint=None):
+    """_backoff() for coroutines: waits without blocking the event loop."""
+    delay = _backoff_delay(attempt, attempts, hint)
+    if delay is None:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+def call(fn, *args, attempts: int = RETRY_ATTEMPTS, label: str = "upstream", **kwargs):
+    """
+    Call fn(*args, **kwargs), an idempotent request, retrying retryable failures.
+
+    Returns the last response (whose status may still be retryable if the
+    retries ran out); re-raises the last exception if every attempt raised.
+    """
+    for attempt in range(attempts):
+        try:
+            response = fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable_error(e) or not _backoff(attempt, attempts):
+                raise
+            logger.debug(f"{label}: retrying after {e!r} (attempt {attempt + 1}/{attempts})")
+            continue
+
+        status = status_of(response)
+        if status not in RETRYABLE_STATUS or not _backoff(attempt, attempts, _retry_after(response)):
+            return response
+        logger.debug(f"{label}: retrying after HTTP {status} (attempt {attempt + 1}/{attempts})")
+
+
+async def acall(fn, *args, attempts: int = RETRY_ATTEMPTS, label: str = "upstream", **kwargs):
+    """call() for async clients: awaits fn(*args, **kwargs) with the same retry policy."""
+    for attempt in range(attempts):
+        try:
+            response = await fn(*args, **kwargs)
+        except Exception as e:
+            if not is_retryable_error(e) or not await _abackoff(attempt, attempts):
+                raise
+            logger.debug(f"{label}: retrying after {e!r} (attempt {attempt + 1}/{attempts})")
+            continue
+
+        status = status_of(response)
+        if status not in RETRYABLE_STATUS or not await _abackoff(attempt, attempts, _retry_after(response)):
+            return response
+        logger.debug(f"{label}: retrying after HTTP {status} (attempt {attempt + 1}/{attempts})")
@@ -0,0 +1,127 @@
+# scheduler.py
+"""
+Application-wide resource scheduler
+Caps how much expensive work can be in flight across *all* requests, per
+resource class (Chromium instances, outbound HTTP calls). Each class has a
+fixed number of slots, a bounded wait queue and a maximum queueing time;
+beyond that, work is rejected early so callers can answer 503 / Retry-After
+instead of forking browsers until the host runs out of memory.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Saturated(Exception):
+    """Raised when a resource class cannot admit more work right now."""
+
+    def __init__(self, resource: str, retry_after: int):
+        super().__init__(f"{resource} capacity exhausted, retry after {retry_after}s")
+        self.resource = resource
+        self.retry_after = retry_after
+
+
+class ResourceClass:
+    """Fixed slots + bounded FIFO wait queue for one kind of resource."""
+
+    def __init__(self, name: str, slots: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._sem = None
+        self.in_use = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+
+    def retry_after(self) -> int:
+        """Rough hint for clients: average queueing time, at least a second."""
+        avg = self.total_wait / self.admitted if self.admitted else self.max_wait
+        return max(1, math.ceil(max(avg, self.max_wait / 2)))
+
+    async def acquire(self):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.slots)
+
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Saturated(self.name, self.retry_after())
+
+        self.waiting += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Saturated(self.name, self.retry_after()) from None
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+        self.in_use += 1
+
+    async def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now (never queues)."""
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.slots)
+        if self._sem.locked():
+            return False
+        await self._sem.acquire()   # free slot and no waiters: returns at once
+        self.admitted += 1
+        self.in_use += 1
+        return True
+
+    def release(self):
+        self.in_use -= 1
+        self._sem.release()
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "in_use": self.in_use,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(1000 * self.total_wait / self.admitted, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait_seen, 1),
+        }
+
+
+BROWSER = "browser"
+HTTP = "http"
+
+POOLS = {
+    BROWSER: ResourceClass(
+        BROWSER,
+        slots=int(os.getenv("BROWSER_SLOTS", "4")),
+        max_queue=int(os.getenv("BROWSER_QUEUE", "16")),
+        max_wait=float(os.getenv("BROWSER_MAX_WAIT", "10")),
+    ),
+    HTTP: ResourceClass(
+        HTTP,
+        slots=int(os.getenv("HTTP_SLOTS", "24")),
+        max_queue=int(os.getenv("HTTP_QUEUE", "200")),
+        max_wait=float(os.getenv("HTTP_MAX_WAIT", "5")),
+    ),
+}
+
+
+def get_pool(name: str) -> ResourceClass:
+    return POOLS[name]
+
+
+def stats() -> dict:
+    return {name: pool.stats() for name, pool in POOLS.items()}
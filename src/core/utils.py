@@ -1,6 +1,6 @@
+import itertools
 import re
 from rapidfuzz import fuzz
-import random
 
 # ------------------------
 # Quantity Normalization (IMPROVED)
@@ -143,49 +143,61 @@ def quantities_close(q1: str, q2: str, tolerance: float = 0.10) -> bool:
 # ------------------------
 # Merge logic (IMPROVED)
 # ------------------------
-def merge_products(results, threshold=75, debug=False):
+class ProductMerger:
     """
-    Improved merging with better matching logic
+    Improved merging with better matching logic, done incrementally
+
+    Products are matched into groups as each platform's results arrive
+    (add), so a streaming search only pays for the new products; results()
+    returns the current groups, ordered the same way on every call.
+    Each group's "platforms" list holds references to the Product records
+    (no per-offer copies).
     """
-    merged = []
-    
-    for product in results:
+
+    def __init__(self, threshold=75, debug=False):
+        self.threshold = threshold
+        self.debug = debug
+        self.groups = []
+        # Per group: cleaned name, brand and normalized quantity (match keys)
+        self._keys = []
+        self._dirty = set()
+
+    def add(self, products):
+        for product in products:
+            self._add(product)
+
+    def _add(self, product):
         # Skip invalid products
-        if not product.get("name") or product["name"].strip().lower() in ("", "n/a"):
-            continue
+        if not product.name or product.name.strip().lower() in ("", "n/a"):
+            return
         
-        name = product["name"].strip()
+        name = product.name.strip()
         cleaned = clean_name(name)
         brand = extract_brand(name)
-        quantity = normalize_quantity(product.get("quantity", ""))
+        quantity = normalize_quantity(product.quantity or "")
         
-        matched_group = None
+        matched = None
         best_score = 0
         
         # Try to find matching group
-        for group in merged:
+        for i, (group, (group_cleaned, group_brand, group_qty)) in enumerate(zip(self.groups, self._keys)):
             # Skip if platform already exists in this group
-            existing_platforms = {p["platform"] for p in group["platforms"]}
-            if product["platform"] in existing_platforms:
+            if any(p.platform == product.platform for p in group["platforms"]):
                 continue
             
-            group_cleaned = clean_name(group["name"])
-            group_brand = extract_brand(group["name"])
-            group_qty = normalize_quantity(group["quantity"])
-            
             # Calculate similarity score
             name_score = fuzz.token_sort_ratio(cleaned, group_cleaned)
             qty_match = (quantity == group_qty or quantities_close(quantity, group_qty))
             brand_match = (brand == group_brand)
             
-            if debug:
+            if self.debug:
                 print(f"COMPARE '{cleaned}' vs '{group_cleaned}' → score={name_score}, brand={brand_match}, qty={qty_match}")
             
             # Matching criteria (improved)
             is_match = False
             
             # Strong match: high score + brand + quantity
-            if name_score >= threshold and brand_match and qty_match:
+            if name_score >= self.threshold and brand_match and qty_match:
                 is_match = True
                 score = name_score
             
@@ -200,44 +212,52 @@ def merge_products(results, threshold=75, debug=False):
                 score = name_score
             
             if is_match and score > best_score:
-                matched_group = group
+                matched = i
                 best_score = score
         
         # Add to matched group or create new
-        if matched_group:
-            matched_group["platforms"].append({
-                "platform": product["platform"],
-                "price": product.get("price", "N/A"),
-                "delivery_time": product.get("delivery_time"),
-                "product_url": product.get("product_url"),
-                "image_url": product.get("image_url"),
-                "in_stock": product.get("in_stock", True),
-            })
+        if matched is not None:
+            self.groups[matched]["platforms"].append(product)
+            self._dirty.add(matched)
         else:
-            merged.append({
+            group_quantity = product.get("quantity", "N/A")
+            self.groups.append({
                 "name": name,
-                "quantity": product.get("quantity", "N/A"),
-                "image_url": product.get("image_url"),
-                "platforms": [{
-                    "platform": product["platform"],
-                    "price": product.get("price", "N/A"),
-                    "delivery_time": product.get("delivery_time"),
-                    "product_url": product.get("product_url"),
-                    "image_url": product.get("image_url"),
-                    "in_stock": product.get("in_stock", True),
-                }]
+                "quantity": group_quantity,
+                "image_url": product.image_url,
+                "platforms": [product],
             })
-    
-    # Add price analysis
-    for product in merged:
-        platforms = product.get("platforms", [])
-        
+            self._keys.append((cleaned, brand, normalize_quantity(group_quantity)))
+
+    def results(self):
+        # Price analysis only for groups that gained a platform since last time
+        for i in self._dirty:
+            self._analyse(self.groups[i])
+        self._dirty.clear()
+
+        # Sort: multi-platform first (by platform count, stable), then the
+        # singles interleaved across platforms in the order they arrived
+        multi_platform = sorted(
+            (g for g in self.groups if len(g["platforms"]) > 1),
+            key=lambda g: len(g["platforms"]), reverse=True,
+        )
+        by_platform = {}
+        for group in self.groups:
+            if len(group["platforms"]) == 1:
+                by_platform.setdefault(group["platforms"][0].platform, []).append(group)
+        single_platform = [g for row in itertools.zip_longest(*by_platform.values()) for g in row if g]
+
+        # Copies, so later adds never change a snapshot that is being served
+        return [{**g, "platforms": list(g["platforms"])} for g in multi_platform + single_platform]
+
+    @staticmethod
+    def _analyse(group):
         # Extract numeric prices
         prices = []
-        for p in platforms:
-            price_str = p.get("price", "0")
+        for p in group["platforms"]:
+            price_str = p.price or "0"
             numeric = float(re.sub(r'[^\d.]', '', price_str) or 0)
-            prices.append({"platform": p["platform"], "price": numeric})
+            prices.append({"platform": p.platform, "price": numeric})
         
         valid_prices = [p for p in prices if p["price"] > 0]
         
@@ -245,7 +265,7 @@ def merge_products(results, threshold=75, debug=False):
             min_price = min(valid_prices, key=lambda x: x["price"])
             max_price = max(valid_prices, key=lambda x: x["price"])
             
-            product["price_analysis"] = {
+            group["price_analysis"] = {
                 "cheapest": min_price["platform"],
                 "cheapest_price": min_price["price"],
                 "most_expensive": max_price["platform"],
@@ -253,15 +273,10 @@ def merge_products(results, threshold=75, debug=False):
                 "savings": max_price["price"] - min_price["price"],
                 "savings_percent": round(((max_price["price"] - min_price["price"]) / max_price["price"]) * 100, 1) if max_price["price"] > 0 else 0
             }
-    
-    # Sort: multi-platform first (by platform count), then shuffle singles
-    multi_platform = [m for m in merged if len(m["platforms"]) > 1]
-    single_platform = [m for m in merged if len(m["platforms"]) == 1]
-    
-    # Sort multi-platform by number of platforms (descending)
-    multi_platform.sort(key=lambda x: len(x["platforms"]), reverse=True)
-    
-    # Shuffle single-platform
-    random.shuffle(single_platform)
-    
-    return multi_platform + single_platform
+
+
+def merge_products(results, threshold=75, debug=False):
+    """Group Product records across platforms in one go (see ProductMerger)."""
+    merger = ProductMerger(threshold, debug)
+    merger.add(results)
+    return merger.results()
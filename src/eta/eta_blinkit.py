@@ -10,6 +10,14 @@ import logging
 import os
 import uuid
 
+try:
+    from src.core import jsonio, retry
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import jsonio, retry
+
 logger = logging.getLogger(__name__)
 
 
@@ -70,12 +78,15 @@ def get_blinkit_eta(address: str, lat: str = None, lon: str = None) -> str:
         }
         
         # Make API call
-        response = scraper.get(url, headers=headers, timeout=10)
+        response = retry.call(
+            lambda: scraper.get(url, headers=headers, timeout=retry.bound_timeout(10)),
+            label="Blinkit ETA",
+        )
         
         duration = time.time() - start_time
         
         if response.status_code == 200:
-            data = response.json()
+            data = jsonio.parse_response(response)
             eta_minutes = data.get('eta_in_minutes')
             
             if eta_minutes and str(eta_minutes).isdigit():
@@ -1,61 +1,28 @@
 # eta_dmart.py
-import requests
 import logging
 
-logger = logging.getLogger(__name__)
-
-BASE_HEADERS = {
-    "User-Agent": (
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) "
-        "Chrome/117.0 Safari/537.36"
-    ),
-    "Accept": "application/json, text/plain, */*",
-    "Origin": "https://www.dmart.in",
-    "Referer": "https://www.dmart.in/",
-}
+# Import DMart client - handle both direct run and module import
+try:
+    from src.scrapers.dmart_client import get_client, run
+    from src.scrapers.dmart_location import get_store_details
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    import os
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.scrapers.dmart_client import get_client, run
+    from src.scrapers.dmart_location import get_store_details
 
-def get_unique_id(search_text: str) -> str:
-    """Fetch uniqueId for a given pincode/address."""
-    url = "https://digital.dmart.in/api/v2/pincodes/suggestions"
-    resp = requests.post(url, json={"searchText": search_text}, headers=BASE_HEADERS, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    results = data.get("searchResult", [])
-    return results[0]["uniqueId"] if results else ""
-
-def get_store_id(pincode: str, unique_id: str) -> str:
-    """Fetch storeId using uniqueId + pincode."""
-    url = "https://digital.dmart.in/api/v2/pincodes/details"
-    payload = {
-        "uniqueId": unique_id,
-        "apiMode": "GA",
-        "pincode": pincode,
-        "currentLat": "",
-        "currentLng": "",
-    }
-    resp = requests.post(url, json=payload, headers=BASE_HEADERS, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
-    return str(data.get("storePincodeDetails", {}).get("storeId", ""))
+logger = logging.getLogger(__name__)
 
-def get_dmart_eta(pincode_or_address: str) -> str:
+async def get_dmart_eta(pincode_or_address: str) -> str:
     """Fetch ETA/delivery slot for Dmart using pincode/address."""
     try:
-        unique_id = get_unique_id(pincode_or_address)
-        if not unique_id:
+        unique_id, store_id = await get_store_details(pincode_or_address)
+        if not unique_id or not store_id:
             return "N/A"
 
-        store_id = get_store_id(pincode_or_address, unique_id)
-        if not store_id:
-            return "N/A"
-
-        url = f"https://digital.dmart.in/api/v2/pincodes/earliestslot/{pincode_or_address}?storeId={store_id}"
-        resp = requests.get(url, headers=BASE_HEADERS, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-
-        slots = data.get("slots", [])
+        slots = await get_client().get_earliest_slots(pincode_or_address, store_id)
         if not slots:
             return "N/A"
 
@@ -73,4 +40,4 @@ def get_dmart_eta(pincode_or_address: str) -> str:
 
 if __name__ == "__main__":
     # Works with pincode or address string
-    print("ETA:", get_dmart_eta("411038"))
\ No newline at end of file
+    print("ETA:", run(get_dmart_eta("411038")))
\ No newline at end of file
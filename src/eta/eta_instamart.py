@@ -2,8 +2,6 @@
 Swiggy Instamart ETA fetcher
 """
 
-from playwright.sync_api import sync_playwright
-import threading
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,34 +9,70 @@ logger = logging.getLogger(__name__)
 # Import geocoding - handle both direct run and module import
 try:
     from src.core.geocoding import geocode_address
+    from src.core import browser_profile, jsonio, retry
 except ImportError:
     # When running directly, add project root to path
     import sys
     import os
     sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
     from src.core.geocoding import geocode_address
+    from src.core import browser_profile, jsonio, retry
 
-# Thread-local storage for Playwright instances
-_thread_local = threading.local()
+def parse_sla(data):
+    """
+    Delivery SLA from a select-location/v2 response as "X min", or None.
+    The search scraper makes the same call, so it can report the ETA too.
+    """
+    try:
+        configs = data['data']['configs']['IM_PAGE_CONFIGS']['configInfo'][0]['card']
+        pod_details = configs['podDetailsList'][0]
+        sla = pod_details['serviceabilityDetails']['sla']
+        
+        # Format as "X min" to match other platforms
+        return f"{int(sla['value'])} min"
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+def _lookup(context, lat, lng):
+    """Ask select-location for the SLA in a pooled browser context."""
+    page = context.new_page()
 
-def _get_browser():
-    """Get or create Playwright browser instance (thread-local)"""
-    if not hasattr(_thread_local, 'playwright') or _thread_local.browser is None or not _thread_local.browser.is_connected():
-        logger.debug("Starting Playwright browser for Instamart...")
-        _thread_local.playwright = sync_playwright().start()
-        _thread_local.browser = _thread_local.playwright.chromium.launch(headless=True)
-        _thread_local.context = _thread_local.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            viewport={'width': 1366, 'height': 768},
-            locale="en-IN",
-            timezone_id="Asia/Kolkata"
+    try:
+        # Call Swiggy Instamart select-location API
+        response = retry.call(
+            lambda: page.request.post(
+                "https://www.swiggy.com/api/instamart/home/select-location/v2",
+                data={
+                    "data": {
+                        "lat": lat,
+                        "lng": lng,
+                        "address": "",
+                        "addressId": "",
+                        "annotation": "",
+                        "clientId": "INSTAMART-APP"
+                    }
+                },
+                timeout=retry.bound_timeout(15) * 1000
+            ),
+            label="Instamart ETA",
         )
-        _thread_local.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            window.chrome = { runtime: {} };
-        """)
-    
-    return _thread_local.context
+
+        if response.ok:
+            data = jsonio.parse_response(response)
+
+            # Extract delivery time from response
+            eta = parse_sla(data)
+            if eta is None:
+                logger.warning("Instamart: Failed to parse response")
+                return "N/A"
+            logger.debug(f"Instamart ETA: {eta}")
+            return eta
+        else:
+            logger.warning(f"Instamart API returned status {response.status}")
+            return "N/A"
+
+    finally:
+        page.close()
 
 def get_instamart_eta(address):
     """
@@ -58,68 +92,16 @@ def get_instamart_eta(address):
             logger.info(f"Instamart: Could not geocode address '{address}'")
             return "N/A"
         
-        # Get browser context
-        context = _get_browser()
-        page = context.new_page()
-        
-        try:
-            # Call Swiggy Instamart select-location API
-            response = page.request.post(
-                "https://www.swiggy.com/api/instamart/home/select-location/v2",
-                data={
-                    "data": {
-                        "lat": lat,
-                        "lng": lng,
-                        "address": "",
-                        "addressId": "",
-                        "annotation": "",
-                        "clientId": "INSTAMART-APP"
-                    }
-                },
-                timeout=15000
-            )
-            
-            if response.ok:
-                data = response.json()
-                
-                # Extract delivery time from response
-                try:
-                    configs = data['data']['configs']['IM_PAGE_CONFIGS']['configInfo'][0]['card']
-                    pod_details = configs['podDetailsList'][0]
-                    sla = pod_details['serviceabilityDetails']['sla']
-                    
-                    delivery_minutes = int(sla['value'])
-                    
-                    # Format as "X min" to match other platforms
-                    eta = f"{delivery_minutes} min"
-                    logger.debug(f"Instamart ETA: {eta}")
-                    return eta
-                except (KeyError, IndexError, TypeError) as e:
-                    logger.warning(f"Instamart: Failed to parse response: {e}")
-                    return "N/A"
-            else:
-                logger.warning(f"Instamart API returned status {response.status}")
-                return "N/A"
-        
-        finally:
-            page.close()
+        # Run in a pooled browser; at most BROWSER_SLOTS stay open, idle ones close
+        return browser_profile.get_pool("instamart").run(_lookup, lat, lng)
     
     except Exception as e:
         logger.error(f"Instamart ETA error: {e}")
         return "N/A"
 
 def cleanup():
-    """Cleanup Playwright resources (call on app shutdown)"""
-    if hasattr(_thread_local, 'browser') and _thread_local.browser:
-        _thread_local.browser.close()
-        _thread_local.browser = None
-    
-    if hasattr(_thread_local, 'playwright') and _thread_local.playwright:
-        _thread_local.playwright.stop()
-        _thread_local.playwright = None
-    
-    if hasattr(_thread_local, 'context'):
-        _thread_local.context = None
+    """Close the pooled Instamart browsers (call on app shutdown)"""
+    browser_profile.get_pool("instamart").close()
 
 
 # Test snippet
@@ -1,10 +1,43 @@
 # eta_zepto.py
+"""
+Zepto ETA
+Fast path: geocode the address, then ask Zepto's serviceability endpoint for
+that coordinate through the shared warmed session (zepto_client.py). Results
+are memoized per geohash cell, so any location already seen answers from
+memory. Driving the location picker in a browser is the last resort; what it
+(or an unserviceable store) gives is remembered for the cell for a shorter
+time, so a repeat lookup does not go straight back to the browser.
+"""
 from playwright.sync_api import sync_playwright
+import os
 import re, random
+import threading
 import logging
+from cachetools import TTLCache
+
+try:
+    from src.core import browser_profile
+    from src.core.geocoding import geocode_address, geohash
+    from src.scrapers.zepto_client import get_client
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import browser_profile
+    from src.core.geocoding import geocode_address, geohash
+    from src.scrapers.zepto_client import get_client
 
 logger = logging.getLogger(__name__)
 
+# Per-cell memo of resolved ETAs (geohash precision 6 ~ 1.2 x 0.6 km)
+GEOHASH_PRECISION = int(os.getenv("ZEPTO_GEOHASH_PRECISION", "6"))
+_cell_etas = TTLCache(maxsize=5000, ttl=int(os.getenv("ZEPTO_ETA_MEMO_TTL", "300")))
+# Per-cell memo of everything else: unserviceable stores and fallback results
+_cell_fallbacks = TTLCache(maxsize=5000, ttl=int(os.getenv("ZEPTO_ETA_FALLBACK_TTL", "120")))
+_cell_lock = threading.Lock()
+
+STORE_UNAVAILABLE = "Store Unavailable / Closed"
+
 # Enhanced user agents for better stealth
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -44,34 +77,130 @@ def normalize_eta(raw: str) -> str:
     ]
     
     if any(indicator in raw for indicator in unavailable_indicators):
-        return "Store Unavailable / Closed"
+        return STORE_UNAVAILABLE
     
     return "N/A"
 
 
+# Objects that describe the serving store, as key paths from the response root.
+# Only these are read: the rest of the layout carries widgets whose generic
+# "eta" / "serviceable" fields say nothing about the store.
+_STORE_PATHS = (
+    (),
+    ("data",),
+    ("storeServiceableResponse",),
+    ("data", "storeServiceableResponse"),
+    ("serviceability",),
+    ("data", "serviceability"),
+    ("store",),
+    ("data", "store"),
+    ("storeDetails",),
+)
+# Store-level delivery ETA, in whole minutes
+_ETA_KEYS = ("etaInMinutes", "eta_in_minutes", "deliveryEtaInMinutes")
+_SERVICEABLE_KEYS = ("serviceable", "isServiceable", "storeServiceable")
+
+
+def _store_objects(data):
+    for path in _STORE_PATHS:
+        obj = data
+        for key in path:
+            obj = obj.get(key) if isinstance(obj, dict) else None
+        if isinstance(obj, dict):
+            yield obj
+
+
+def parse_serviceability(data) -> str:
+    """
+    ETA from a serviceability response as "X min", STORE_UNAVAILABLE when the
+    serving store reports the location as not served, or None if the store
+    objects have neither.
+    """
+    serviceable = None
+    for obj in _store_objects(data):
+        for key in _ETA_KEYS:
+            value = obj.get(key)
+            if isinstance(value, int) and not isinstance(value, bool) and value > 0:
+                return f"{value} min"
+        for key in _SERVICEABLE_KEYS:
+            if obj.get(key) is False:
+                serviceable = False
+    return STORE_UNAVAILABLE if serviceable is False else None
+
+
+def _eta_from_api(lat, lng):
+    try:
+        return parse_serviceability(get_client().get_serviceability(lat, lng))
+    except Exception as e:
+        logger.warning(f"Zepto serviceability lookup failed: {e}")
+        return None
+
+
+def _memo_key(address: str):
+    """Geohash cell of the address, or the address itself when it cannot be geocoded."""
+    lat, lng = geocode_address(address)
+    if lat is None or lng is None:
+        return f"address:{address.strip().lower()}", None, None
+    return geohash(lat, lng, GEOHASH_PRECISION), lat, lng
+
+
+def lookup_zepto_eta(address: str):
+    """
+    ETA from the cell memo or the serviceability endpoint (plain HTTP), or
+    None when only the browser fallback can answer.
+    """
+    key, lat, lng = _memo_key(address)
+    with _cell_lock:
+        eta = _cell_etas.get(key) or _cell_fallbacks.get(key)
+    if eta:
+        logger.debug(f"Zepto ETA memo hit for {key}: {eta}")
+        return eta
+    if lat is None:
+        return None
+
+    eta = _eta_from_api(lat, lng)
+    if eta:
+        # Store-level minute values are trusted for the full memo TTL
+        with _cell_lock:
+            if eta.endswith(" min"):
+                _cell_etas[key] = eta
+            else:
+                _cell_fallbacks[key] = eta
+    return eta
+
+
+def get_zepto_eta_from_ui(address: str, headed: bool = False) -> str:
+    """Browser fallback for lookup_zepto_eta; its result is remembered for the cell."""
+    eta = _eta_from_ui(address, headed)
+    key, _, _ = _memo_key(address)
+    with _cell_lock:
+        _cell_fallbacks[key] = eta
+    return eta
+
+
 def get_zepto_eta(address: str, headed: bool = False) -> str:
     """
     Fetch delivery ETA for Zepto.
     Requires a valid address string (validated upstream in app.py).
     """
+    eta = lookup_zepto_eta(address)
+    if eta:
+        return eta
+    logger.info("Zepto serviceability lookup gave no ETA, falling back to the location UI")
+    return get_zepto_eta_from_ui(address, headed)
+
+
+def _eta_from_ui(address: str, headed: bool = False) -> str:
+    """Last resort: set the location through Zepto's UI and read the ETA off the page."""
     with sync_playwright() as p:
         # Enhanced browser launch with optimizations
-        browser = p.chromium.launch(
-            headless=not headed,
-            args=[
-                "--no-sandbox", 
-                "--disable-dev-shm-usage",
-                "--disable-blink-features=AutomationControlled",
-                "--no-first-run"
-            ]
-        )
+        browser = browser_profile.launch(p, headless=not headed)
         
-        # Enhanced context with better stealth
-        context = browser.new_context(
+        # Lightweight profile; the location picker is clicked through, so keep CSS
+        context = browser_profile.new_context(
+            browser, "zepto",
+            allow_types={"stylesheet"},
             user_agent=random.choice(USER_AGENTS),
-            viewport={"width": 1366, "height": 768},
-            locale="en-IN",
-            timezone_id="Asia/Kolkata",
             extra_http_headers={
                 "Accept-Language": "en-IN,en;q=0.9",
                 "Accept-Encoding": "gzip, deflate, br"
@@ -80,18 +209,9 @@ def get_zepto_eta(address: str, headed: bool = False) -> str:
         page = context.new_page()
         eta = "N/A"
 
-        # Enhanced resource blocking for speed
-        context.route("**/*", lambda route: (
-            route.abort() if route.request.resource_type in ["image", "font", "media"] 
-            else route.continue_()
-        ))
-        
-        # Enhanced stealth
-        context.add_init_script('Object.defineProperty(navigator, "webdriver", { get: () => undefined });')
-
         try:
             # Optimized navigation with reduced timeout
-            page.goto("https://www.zeptonow.com/", timeout=25000)
+            browser_profile.goto(page, "zepto", "https://www.zeptonow.com/", timeout=25000)
 
             # Enhanced location setting with multiple fallbacks
             location_set = False
@@ -5,31 +5,73 @@ Uses cloudscraper to bypass Cloudflare protection
 """
 
 import cloudscraper
+import functools
+import re
 import time
 import logging
 import os
 import uuid
 
+try:
+    from src.core import jsonio, retry
+    from src.core.product import Product
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import jsonio, retry
+    from src.core.product import Product
+
 logger = logging.getLogger(__name__)
 
 
-def run_scraper(search_query: str, max_products: int = 30):
+# Blinkit returns ~12 cards per follow-up page; callers may ask for more or fewer
+DEFAULT_PAGE_SIZE = 12
+DEFAULT_MAX_PRODUCTS = 30
+# Largest max_products a search may ask for (the /search limit)
+MAX_PRODUCTS = 100
+# Upper bound on follow-up pages fetched for a single search:
+# enough for MAX_PRODUCTS at the default page size. A smaller page_size
+# gets at most this many follow-up pages, i.e. fewer products.
+MAX_EXTRA_PAGES = -(-MAX_PRODUCTS // DEFAULT_PAGE_SIZE)
+
+
+def _fetch_sequentially(fetchers):
+    return [fetch() for fetch in fetchers]
+
+
+def run_scraper(search_query: str, max_products: int = DEFAULT_MAX_PRODUCTS,
+                page_size: int = DEFAULT_PAGE_SIZE, on_eta=None, fetch_pages=None):
     """
     Scrape Blinkit products using direct API call with pagination
     
+    The first page is fetched on its own; if it shows more results exist,
+    the follow-up pages are requested and merged back in page order,
+    de-duplicated by product ID.
+    
     Args:
         search_query: Product search query (e.g., "amul milk")
         max_products: Maximum number of products to fetch (default: 30)
+        page_size: Products requested per follow-up page (default: 12)
+        on_eta: Optional callback; receives the delivery ETA ("X min") shown
+            on the first page's product cards, when present
+        fetch_pages: Optional runner for the follow-up pages: takes a list of
+            zero-argument page fetchers, returns their results in order. The
+            app passes one that gives each page its own HTTP slot and rate
+            limit token; without it the pages are fetched one after another.
     
     Returns:
         List of product dictionaries
     
+    Raises:
+        Exception if the first page cannot be fetched (after retries), so a
+        failure is never mistaken for an empty result
+    
     Performance: ~1-2 seconds for 30 products
     """
     
     try:
         start_time = time.time()
-        all_products = []
         
         # Create cloudscraper session
         scraper = cloudscraper.create_scraper(
@@ -82,49 +124,99 @@ def run_scraper(search_query: str, max_products: int = 30):
             "vertical_cards_processed": 0
         }
         
-        response = scraper.post(url, headers=headers, params=params, json=post_body, timeout=10)
+        first_page = _fetch_page(scraper, url, headers, params, post_body, on_eta=on_eta)
+        if first_page is None:
+            # Failed, not empty: must not be cached as "no products"
+            raise retry.UpstreamError("Blinkit search request failed")
         
-        if response.status_code == 200:
-            data = response.json()
-            products = parse_search_response(data)
-            all_products.extend(products)
-            
-            # If we need more products and there are more available, fetch next page
-            if len(all_products) < max_products and len(products) > 0:
-                # Second request - pagination
-                params['offset'] = len(all_products)
-                params['limit'] = 12
-                params['page_index'] = 1
-                
-                response2 = scraper.post(url, headers=headers, params=params, json=post_body, timeout=10)
-                
-                if response2.status_code == 200:
-                    data2 = response2.json()
-                    products2 = parse_search_response(data2)
-                    all_products.extend(products2)
-                    
-                    # Third request if still need more
-                    if len(all_products) < max_products and len(products2) > 0:
-                        params['offset'] = len(all_products)
-                        params['page_index'] = 2
-                        
-                        response3 = scraper.post(url, headers=headers, params=params, json=post_body, timeout=10)
-                        
-                        if response3.status_code == 200:
-                            data3 = response3.json()
-                            products3 = parse_search_response(data3)
-                            all_products.extend(products3)
-            
-            # Limit to max_products
-            all_products = all_products[:max_products]
+        pages = [first_page]
+        
+        # More results exist - fetch the remaining pages
+        remaining = max_products - len(first_page)
+        if remaining > 0 and first_page and page_size > 0:
+            extra_pages = min(-(-remaining // page_size), MAX_EXTRA_PAGES)
+            page_params = []
+            for page_index in range(1, extra_pages + 1):
+                page_params.append({
+                    **params,
+                    'offset': len(first_page) + (page_index - 1) * page_size,
+                    'limit': page_size,
+                    'page_index': page_index,
+                })
             
-            return all_products
-        else:
-            return []
+            fetchers = [functools.partial(_fetch_page, scraper, url, headers, p, post_body)
+                        for p in page_params]
+            pages.extend(page or [] for page in (fetch_pages or _fetch_sequentially)(fetchers))
+        
+        all_products = []
+        seen = set()
+        for page in pages:
+            for product in page:
+                key = product_key(product)
+                if key:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                all_products.append(product)
+        
+        # Limit to max_products
+        all_products = all_products[:max_products]
+        logger.debug(f"Blinkit: {len(all_products)} products from {len(pages)} page(s) in {time.time() - start_time:.2f}s")
+        
+        return all_products
             
     except Exception as e:
         logger.error(f"Blinkit scraper failed for '{search_query}': {e}")
-        return []
+        raise
+
+
+def _fetch_page(scraper, url, headers, params, post_body, timeout=10, on_eta=None):
+    """Fetch and parse a single search page. Returns None on a non-200 response."""
+    try:
+        response = retry.call(
+            lambda: scraper.post(url, headers=headers, params=params, json=post_body,
+                                 timeout=retry.bound_timeout(timeout)),
+            label="Blinkit search",
+        )
+    except Exception as e:
+        logger.warning(f"Blinkit page {params.get('page_index', 0)} failed: {e}")
+        return None
+    
+    if response.status_code != 200:
+        logger.warning(f"Blinkit page {params.get('page_index', 0)} returned status {response.status_code}")
+        return None
+    
+    data = jsonio.parse_response(response)
+    if on_eta:
+        eta = parse_eta_from_response(data)
+        if eta:
+            on_eta(eta)
+    return parse_search_response(data)
+
+
+_ETA_MINUTES_RE = re.compile(r'(\d+)\s*min', re.IGNORECASE)
+
+
+def parse_eta_from_response(data):
+    """
+    Delivery ETA from a search response as "X min", or None.
+    Product cards carry an `eta_tag` ("8 MINS") for the store serving the
+    request's lat/lon - the same store the ETA endpoint reports on.
+    """
+    try:
+        for snippet in data.get('response', {}).get('snippets', []):
+            snippet_data = snippet.get('data') if isinstance(snippet, dict) else None
+            if not isinstance(snippet_data, dict):
+                continue
+            tag = snippet_data.get('eta_tag')
+            title = tag.get('title', {}) if isinstance(tag, dict) else {}
+            text = title.get('text', '') if isinstance(title, dict) else ''
+            match = _ETA_MINUTES_RE.search(text or '')
+            if match:
+                return f"{match.group(1)} min"
+    except Exception as e:
+        logger.debug(f"Failed to parse Blinkit ETA from search: {e}")
+    return None
 
 
 def parse_search_response(data):
@@ -193,15 +285,15 @@ def parse_product_from_snippet(snippet_data):
         in_stock = inventory > 0
         
         if name and name.strip():
-            return {
-                "platform": "blinkit",
-                "name": name.strip(),
-                "price": price,
-                "quantity": quantity,
-                "image_url": image_url,
-                "product_url": product_url,
-                "in_stock": in_stock,
-            }
+            return Product(
+                platform="blinkit",
+                name=name.strip(),
+                price=price,
+                quantity=quantity,
+                image_url=image_url,
+                product_url=product_url,
+                in_stock=in_stock,
+            )
             
     except Exception as e:
         logger.debug(f"Failed to parse product snippet: {e}")
@@ -0,0 +1,154 @@
+# dmart_client.py
+"""
+Shared DMart API client
+One pooled, keep-alive httpx.AsyncClient for every call to digital.dmart.in,
+so pincode lookups, store resolution, search and slot queries reuse warm
+TLS connections instead of opening a new one each time. Every method is a
+coroutine: the fetch engine runs DMart natively on its event loop, without
+holding an executor thread per request. Transient failures (connection
+resets, 429/5xx) are retried by the shared policy in retry.py.
+"""
+
+import asyncio
+import os
+import threading
+import logging
+import httpx
+
+try:
+    from src.core import jsonio, retry
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import jsonio, retry
+
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://digital.dmart.in/api"
+
+# --- Shared headers for all Dmart API calls ---
+BASE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/117.0 Safari/537.36"
+    ),
+    "Accept": "application/json, text/plain, */*",
+    "Origin": "https://www.dmart.in",
+    "Referer": "https://www.dmart.in/",
+}
+
+# Connections kept open to digital.dmart.in (one per concurrent caller is plenty)
+POOL_SIZE = int(os.getenv("DMART_POOL_SIZE", "16"))
+
+
+class DMartClient:
+    """Pooled httpx.AsyncClient for the DMart API, bound to one event loop."""
+
+    def __init__(self, pool_size: int = POOL_SIZE):
+        self.session = httpx.AsyncClient(
+            base_url=API_BASE,
+            headers=BASE_HEADERS,
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _get_json(self, path: str, timeout: float = 10, **kwargs) -> dict:
+        resp = await retry.acall(
+            lambda: self.session.get(path, timeout=retry.bound_timeout(timeout), **kwargs),
+            label=f"DMart {path}",
+        )
+        resp.raise_for_status()
+        return jsonio.parse_response(resp)
+
+    async def _post_json(self, path: str, payload: dict, timeout: float = 10) -> dict:
+        # All DMart endpoints we call are lookups, so POSTs are safe to replay
+        resp = await retry.acall(
+            lambda: self.session.post(path, json=payload, timeout=retry.bound_timeout(timeout)),
+            label=f"DMart {path}",
+        )
+        resp.raise_for_status()
+        return jsonio.parse_response(resp)
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def get_unique_id(self, search_text: str) -> str:
+        """Fetch uniqueId for a given pincode/address."""
+        data = await self._post_json("/v2/pincodes/suggestions", {"searchText": search_text})
+        results = data.get("searchResult", [])
+        return results[0]["uniqueId"] if results else ""
+
+    async def get_store_id(self, pincode: str, unique_id: str) -> str:
+        """Fetch storeId using uniqueId + pincode."""
+        payload = {
+            "uniqueId": unique_id,
+            "apiMode": "GA",
+            "pincode": pincode,
+            "currentLat": "",
+            "currentLng": "",
+        }
+        data = await self._post_json("/v2/pincodes/details", payload)
+        return str(data.get("storePincodeDetails", {}).get("storeId", ""))
+
+    async def get_earliest_slots(self, pincode: str, store_id: str) -> list:
+        """Fetch the earliest delivery slots for a store."""
+        data = await self._get_json(f"/v2/pincodes/earliestslot/{pincode}", params={"storeId": store_id})
+        return data.get("slots", [])
+
+    async def search(self, query: str, store_id: str, page: int = 1, size: int = 100,
+                     timeout: float = 20) -> dict:
+        """Run a product search against a specific store."""
+        params = {"page": page, "size": size, "channel": "web", "storeId": store_id}
+        return await self._get_json(f"/v3/search/{query}", timeout=timeout, params=params)
+
+
+_client = None
+_client_loop = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> DMartClient:
+    """
+    Return the DMart client for the running event loop, creating it on first
+    use. The app only ever runs DMart on the fetch engine's loop, so there is
+    one client per process; a script's loop gets its own (see run()). A
+    client replaced because its loop changed is closed on that loop if it is
+    still running.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _client is not None and _client_loop is loop:
+            return _client
+        old, old_loop = _client, _client_loop
+        _client, _client_loop = DMartClient(), loop
+        client = _client
+    logger.debug(f"DMart client ready (pool size {POOL_SIZE})")
+    if old is not None:
+        if old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(old.aclose(), old_loop)
+        else:
+            logger.debug("Dropped a DMart client whose event loop has stopped")
+    return client
+
+
+async def close_client():
+    """Close the running loop's client, if it has one."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        if _client is None or _client_loop is not loop:
+            return
+        client, _client, _client_loop = _client, None, None
+    await client.aclose()
+
+
+def run(coro):
+    """asyncio.run() for scripts: closes the DMart client before the loop ends."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await close_client()
+    return asyncio.run(main())
@@ -1,21 +1,22 @@
 # dmart_scraper.py
-import requests
+import asyncio
 import logging
-from .dmart_location import BASE_HEADERS
+import os
+
+from .dmart_client import get_client, run
+from src.core.product import Product
 
 logger = logging.getLogger(__name__)
 
-def run_dmart_scraper(query: str, store_id: str):
-    """
-    Scrape products from Dmart for a specific query and store.
-    Store ID ensures results are location-specific.
-    """
-    url = f"https://digital.dmart.in/api/v3/search/{query}?page=1&size=100&channel=web&storeId={store_id}"
-    resp = requests.get(url, headers=BASE_HEADERS, timeout=20)
-    resp.raise_for_status()
-    data = resp.json()
+DEFAULT_MAX_PRODUCTS = 30
+# Products per search page (each product expands into one or more SKUs)
+DMART_PAGE_SIZE = int(os.getenv("DMART_PAGE_SIZE", "40"))
+# Upper bound on pages fetched for a single search
+DMART_MAX_PAGES = int(os.getenv("DMART_MAX_PAGES", "5"))
+
 
-    raw_products = data.get("products", [])
+def parse_products(raw_products):
+    """Expand DMart search products into one Product per SKU."""
     products = []
     for product in raw_products:
         for sku in product.get("sKUs", []):
@@ -33,16 +34,16 @@ def run_dmart_scraper(query: str, store_id: str):
                 sku_id = sku.get("skuUniqueID")
                 product_url = f"https://www.dmart.in/product/{seo_token}?selectedProd={sku_id}" if seo_token and sku_id else ""
 
-                products.append({
-                    "platform": "dmart",
-                    "name": name,
-                    "price": f"₹{price}" if price else "N/A",
-                    "quantity": qty,
-                    "image_url": image_url,
-                    "product_url": product_url,
-                    "delivery_time": "N/A",  # ETA handled separately
-                    "in_stock": sku.get("buyable") == "true"
-                })
+                products.append(Product(
+                    platform="dmart",
+                    name=name,
+                    price=f"₹{price}" if price else "N/A",
+                    quantity=qty,
+                    image_url=image_url,
+                    product_url=product_url,
+                    delivery_time="N/A",  # ETA handled separately
+                    in_stock=sku.get("buyable") == "true"
+                ))
             except Exception as e:
                 logger.debug(f"Failed to parse DMart product: {e}")
                 continue
@@ -50,8 +51,85 @@ def run_dmart_scraper(query: str, store_id: str):
     return products
 
 
+async def _fetch_page(query, store_id, page, page_size):
+    """Raw products of one follow-up page; [] if it fails (the results so far still count)."""
+    try:
+        return (await get_client().search(query, store_id, page=page, size=page_size)).get("products", [])
+    except Exception as e:
+        logger.warning(f"DMart page {page} for '{query}' failed: {e}")
+        return []
+
+
+def _pages_needed(wanted, in_stock, products_seen, page_size):
+    """Pages expected to yield `wanted` more in-stock SKUs, at the rate seen so far."""
+    per_product = in_stock / products_seen if in_stock else 1.0
+    return max(1, -(-int(wanted / per_product) // page_size))
+
+
+def _take(pages, max_products):
+    """SKUs in page order, de-duplicated, up to and including the max_products-th in stock."""
+    products, seen, in_stock = [], set(), 0
+    for page in pages:
+        for product in page:
+            # Pages can shift between requests; keep the first copy of a SKU
+            if product.product_url:
+                if product.product_url in seen:
+                    continue
+                seen.add(product.product_url)
+            products.append(product)
+            in_stock += product.in_stock
+            if in_stock >= max_products:
+                return products
+    return products
+
+
+async def run_dmart_scraper(query: str, store_id: str, max_products: int = DEFAULT_MAX_PRODUCTS,
+                            page_size: int = DMART_PAGE_SIZE):
+    """
+    Scrape products from Dmart for a specific query and store.
+    Store ID ensures results are location-specific.
+
+    The first page is fetched on its own. If it is full but holds fewer
+    than `max_products` in-stock SKUs, the pages expected to make up the
+    rest are fetched concurrently (DMART_MAX_PAGES in all at most).
+    Collection stops at the `max_products`-th in-stock SKU; out-of-stock
+    SKUs listed before it are kept.
+    """
+    # A first-page failure raises: the search failed, it is not empty
+    first = (await get_client().search(query, store_id, page=1, size=page_size)).get("products", [])
+
+    pages = [parse_products(first)]
+    full = len(first) >= page_size
+    fetched, products_seen = 1, len(first)
+    in_stock = sum(p.in_stock for p in pages[0])
+
+    while full and in_stock < max_products and fetched < DMART_MAX_PAGES:
+        extra = min(_pages_needed(max_products - in_stock, in_stock, products_seen, page_size),
+                    DMART_MAX_PAGES - fetched)
+        # Tasks copy this context, so each page keeps the request deadline;
+        # gather returns them in page order
+        raw_pages = await asyncio.gather(*(
+            _fetch_page(query, store_id, page, page_size)
+            for page in range(fetched + 1, fetched + extra + 1)
+        ))
+        fetched += extra
+
+        for raw in raw_pages:
+            page = parse_products(raw)
+            pages.append(page)
+            products_seen += len(raw)
+            in_stock += sum(p.in_stock for p in page)
+            full = len(raw) >= page_size
+            if not full:
+                break
+
+    products = _take(pages, max_products)
+    logger.debug(f"DMart: {len(products)} SKUs from {fetched} page(s) for '{query}'")
+    return products
+
+
 if __name__ == "__main__":
     # Example: test with storeId
     test_store_id = "10680"  # Replace with real storeId
-    results = run_dmart_scraper("milk", test_store_id)
-    print("✅ Sample product:", results[0] if results else "No results")
\ No newline at end of file
+    results = run(run_dmart_scraper("milk", test_store_id))
+    print("✅ Sample product:", results[0] if results else "No results")
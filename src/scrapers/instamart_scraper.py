@@ -2,7 +2,6 @@
 Swiggy Instamart Product Scraper
 """
 
-from playwright.sync_api import sync_playwright
 import threading
 import logging
 
@@ -11,57 +10,105 @@ logger = logging.getLogger(__name__)
 # Import geocoding only when not running as main (to avoid import issues in testing)
 if __name__ != "__main__":
     from src.core.geocoding import geocode_address
+    from src.core import browser_profile, jsonio, retry
+    from src.core.product import Product
+    from src.eta.eta_instamart import parse_sla
+
+# Where search/v2 puts product items; "*" steps into every element of a list
+PRODUCT_PATHS = (
+    ("data", "cards", "*", "card", "card", "gridElements", "infoWithStyle", "items", "*"),
+    ("data", "widgets", "*", "data", "*"),
+)
+
+# How often each extraction path answered (fallback > 0 means the schema moved)
+_parser_stats = {"targeted": 0, "fallback": 0, "empty": 0}
+_parser_stats_lock = threading.Lock()
+
+
+def _is_product(node):
+    return isinstance(node, dict) and 'displayName' in node and 'variations' in node
+
+
+def _follow(node, path):
+    """Yield the nodes reached by walking `path` from `node` (missing steps yield nothing)."""
+    nodes = [node]
+    for step in path:
+        following = []
+        for current in nodes:
+            if step == "*":
+                if isinstance(current, list):
+                    following.extend(current)
+            elif isinstance(current, dict) and step in current:
+                following.append(current[step])
+        nodes = following
+    return nodes
+
+
+def _walk_products(data):
+    """Generic fallback: every product-shaped dict in the tree, in document order."""
+    found = []
+    # Stack of iterators rather than recursion: no depth limit, no per-node call
+    stack = [iter((data,))]
+    while stack:
+        for node in stack[-1]:
+            if isinstance(node, dict):
+                if 'displayName' in node and 'variations' in node:
+                    found.append(node)
+                    continue
+                stack.append(iter(node.values()))
+                break
+            if isinstance(node, list):
+                stack.append(iter(node))
+                break
+        else:
+            stack.pop()
+    return found
 
-# Thread-local storage for Playwright instances
-_thread_local = threading.local()
-
-def _get_browser():
-    """Get or create Playwright browser instance (thread-local)"""
-    if not hasattr(_thread_local, 'playwright') or _thread_local.browser is None or not _thread_local.browser.is_connected():
-        _thread_local.playwright = sync_playwright().start()
-        _thread_local.browser = _thread_local.playwright.chromium.launch(headless=True)
-        _thread_local.context = _thread_local.browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
-            viewport={'width': 1366, 'height': 768},
-            locale="en-IN",
-            timezone_id="Asia/Kolkata"
-        )
-        _thread_local.context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', { get: () => undefined });
-            window.chrome = { runtime: {} };
-        """)
-    
-    return _thread_local.context
 
-def run_instamart_scraper(query, address):
+def _count(kind):
+    with _parser_stats_lock:
+        _parser_stats[kind] += 1
+
+
+def extract_products(data):
     """
-    Scrape products from Swiggy Instamart
-    
-    Args:
-        query: Search query (e.g., "milk", "bread")
-        address: Full address string
-    
-    Returns:
-        list: List of product dictionaries
+    Product dicts from a search/v2 response. Reads the known card/widget
+    paths directly; walks the whole tree only if none of them has products.
     """
+    for path in PRODUCT_PATHS:
+        products = [node for node in _follow(data, path) if _is_product(node)]
+        if products:
+            _count("targeted")
+            return products
+
+    products = _walk_products(data)
+    if products:
+        _count("fallback")
+        logger.warning(f"Instamart: products found only by full-tree walk ({len(products)}); "
+                       f"search response layout may have changed")
+    else:
+        _count("empty")
+    return products
+
+
+def parser_stats() -> dict:
+    """Counts of searches answered by the known paths, by the fallback walk, or empty."""
+    with _parser_stats_lock:
+        return dict(_parser_stats)
+
+def _search(context, query, lat, lng, on_eta=None):
+    """Run the search in a pooled browser context (see run_instamart_scraper)."""
+    page = context.new_page()
+
     try:
-        # Geocode address to lat/lng
-        lat, lng = geocode_address(address)
-        
-        if lat is None or lng is None:
-            return []
-        
-        # Get browser context
-        context = _get_browser()
-        page = context.new_page()
-        
-        try:
-            # Initialize session
-            page.goto(f"https://www.swiggy.com/instamart?lat={lat}&lng={lng}", timeout=30000)
-            page.wait_for_timeout(2000)
-            
-            # Get store ID
-            response = page.request.post(
+        # Initialize session
+        browser_profile.goto(page, "instamart", f"https://www.swiggy.com/instamart?lat={lat}&lng={lng}",
+                             timeout=30000, wait_until="domcontentloaded")
+        page.wait_for_timeout(2000)
+
+        # Get store ID
+        response = retry.call(
+            lambda: page.request.post(
                 "https://www.swiggy.com/api/instamart/home/select-location/v2",
                 data={
                     "data": {
@@ -73,20 +120,29 @@ def run_instamart_scraper(query, address):
                         "clientId": "INSTAMART-APP"
                     }
                 },
-                timeout=15000
-            )
-            
-            if not response.ok:
-                return []
-            
-            data = response.json()
-            configs = data['data']['configs']['IM_PAGE_CONFIGS']['configInfo'][0]['card']
-            store_id = configs['podDetailsList'][0]['podId']
-            
-            # Search for products
-            url = f"https://www.swiggy.com/api/instamart/search/v2?offset=0&ageConsent=false&layoutId=4987&voiceSearchTrackingId=&storeId={store_id}&primaryStoreId={store_id}&secondaryStoreId="
-            
-            response = page.request.post(
+                timeout=retry.bound_timeout(15) * 1000
+            ),
+            label="Instamart select-location",
+        )
+
+        if not response.ok:
+            raise retry.UpstreamError(f"Instamart select-location returned {response.status}", response.status)
+
+        data = jsonio.parse_response(response)
+        configs = data['data']['configs']['IM_PAGE_CONFIGS']['configInfo'][0]['card']
+        store_id = configs['podDetailsList'][0]['podId']
+
+        # Same payload get_instamart_eta reads - report the ETA for free
+        if on_eta:
+            eta = parse_sla(data)
+            if eta:
+                on_eta(eta)
+
+        # Search for products
+        url = f"https://www.swiggy.com/api/instamart/search/v2?offset=0&ageConsent=false&layoutId=4987&voiceSearchTrackingId=&storeId={store_id}&primaryStoreId={store_id}&secondaryStoreId="
+
+        response = retry.call(
+            lambda: page.request.post(
                 url,
                 data={
                     "facets": [],
@@ -96,90 +152,97 @@ def run_instamart_scraper(query, address):
                     "page_type": "INSTAMART_AUTO_SUGGEST_PAGE",
                     "is_pre_search_tag": False
                 },
-                timeout=15000
-            )
-            
-            if not response.ok:
-                return []
-            
-            data = response.json()
-            
-            # Extract products
-            products = []
-            
-            def extract_products(obj):
-                if isinstance(obj, dict):
-                    if 'displayName' in obj and 'variations' in obj:
-                        products.append(obj)
-                    for value in obj.values():
-                        if isinstance(value, (dict, list)):
-                            extract_products(value)
-                elif isinstance(obj, list):
-                    for item in obj:
-                        extract_products(item)
-            
-            extract_products(data)
-            
-            # Format products for QuickKart
-            formatted_products = []
-            for product in products:
-                # Get listing variant (or first variation)
-                variation = None
-                for v in product.get('variations', []):
-                    if v.get('listingVariant', False):
-                        variation = v
-                        break
-                
-                if not variation and product.get('variations'):
-                    variation = product['variations'][0]
-                
-                if variation:
-                    price_info = variation.get('price', {})
-                    
-                    # Get image URL
-                    image_ids = variation.get('imageIds', [])
-                    image_url = None
-                    if image_ids:
-                        image_url = f"https://instamart-media-assets.swiggy.com/swiggy/image/upload/fl_lossy,f_auto,q_auto,h_600,w_600/{image_ids[0]}"
-                    
-                    # Get product URL
-                    product_id = product.get('productId') or variation.get('spinId')
-                    product_url = f"https://www.swiggy.com/instamart/item/{product_id}" if product_id else None
-                    
-                    # Format price
-                    offer_price = price_info.get('offerPrice', {}).get('units', 0)
-                    
-                    formatted_products.append({
-                        'name': product.get('displayName', ''),
-                        'quantity': variation.get('quantityDescription', ''),
-                        'platform': 'instamart',
-                        'price': f"₹{offer_price}",
-                        'product_url': product_url,
-                        'image_url': image_url,
-                        'in_stock': product.get('inStock', False)
-                    })
-            
-            return formatted_products
+                timeout=retry.bound_timeout(15) * 1000
+            ),
+            label="Instamart search",
+        )
+
+        if not response.ok:
+            raise retry.UpstreamError(f"Instamart search returned {response.status}", response.status)
+
+        data = jsonio.parse_response(response)
+
+        # Extract products
+        products = extract_products(data)
+
+        # Format products for QuickKart
+        formatted_products = []
+        for product in products:
+            # Get listing variant (or first variation)
+            variation = None
+            for v in product.get('variations', []):
+                if v.get('listingVariant', False):
+                    variation = v
+                    break
+
+            if not variation and product.get('variations'):
+                variation = product['variations'][0]
+
+            if variation:
+                price_info = variation.get('price', {})
+
+                # Get image URL
+                image_ids = variation.get('imageIds', [])
+                image_url = None
+                if image_ids:
+                    image_url = f"https://instamart-media-assets.swiggy.com/swiggy/image/upload/fl_lossy,f_auto,q_auto,h_600,w_600/{image_ids[0]}"
+
+                # Get product URL
+                product_id = product.get('productId') or variation.get('spinId')
+                product_url = f"https://www.swiggy.com/instamart/item/{product_id}" if product_id else None
+
+                # Format price
+                offer_price = price_info.get('offerPrice', {}).get('units', 0)
+
+                formatted_products.append(Product(
+                    name=product.get('displayName', ''),
+                    quantity=variation.get('quantityDescription', ''),
+                    platform='instamart',
+                    price=f"₹{offer_price}",
+                    product_url=product_url,
+                    image_url=image_url,
+                    in_stock=product.get('inStock', False)
+                ))
+
+        return formatted_products
+
+    finally:
+        page.close()
+
+def run_instamart_scraper(query, address, on_eta=None):
+    """
+    Scrape products from Swiggy Instamart
+    
+    Args:
+        query: Search query (e.g., "milk", "bread")
+        address: Full address string
+        on_eta: Optional callback; receives the delivery ETA ("X min") from
+            the select-location response, which carries the store's SLA
+    
+    Returns:
+        list: List of product dictionaries
+    
+    Raises:
+        retry.UpstreamError (or the client's error) when a step fails, so a
+        failure is never mistaken for an empty result
+    """
+    try:
+        # Geocode address to lat/lng
+        lat, lng = geocode_address(address)
+        
+        if lat is None or lng is None:
+            raise retry.UpstreamError(f"Could not geocode '{address}'")
         
-        finally:
-            page.close()
+        # Run in a pooled browser; at most BROWSER_SLOTS stay open, idle ones close
+        return browser_profile.get_pool("instamart").run(_search, query, lat, lng, on_eta)
     
     except Exception as e:
         logger.error(f"Instamart scraper failed for '{query}': {e}")
-        return []
+        raise
 
 def cleanup():
-    """Cleanup Playwright resources"""
-    if hasattr(_thread_local, 'browser') and _thread_local.browser:
-        _thread_local.browser.close()
-        _thread_local.browser = None
-    
-    if hasattr(_thread_local, 'playwright') and _thread_local.playwright:
-        _thread_local.playwright.stop()
-        _thread_local.playwright = None
-    
-    if hasattr(_thread_local, 'context'):
-        _thread_local.context = None
+    """Close the pooled Instamart browsers"""
+    browser_profile.get_pool("instamart").close()
 
 
 # Test snippet
@@ -198,6 +261,9 @@ if __name__ == "__main__":
     
     # Import geocoding function for testing
     from src.core.geocoding import geocode_address
+    from src.core import browser_profile, jsonio, retry
+    from src.core.product import Product
+    from src.eta.eta_instamart import parse_sla
     
     # Get query and address from command line or use defaults
     query = sys.argv[1] if len(sys.argv) > 1 else "milk"
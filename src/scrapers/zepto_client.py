@@ -0,0 +1,105 @@
+# zepto_client.py
+"""
+Shared Zepto API client
+One warmed, keep-alive requests.Session for Zepto's JSON endpoints. The
+session visits the storefront once to pick up its cookies, then answers
+serviceability lookups for a lat/lng directly, without driving a browser
+through the location picker.
+"""
+
+import os
+import threading
+import logging
+import uuid
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from src.core import jsonio, retry
+except ImportError:
+    # When running directly, add project root to path
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import jsonio, retry
+
+logger = logging.getLogger(__name__)
+
+WEB_BASE = "https://www.zeptonow.com"
+# Store/serviceability lookup for a coordinate (returns the serving store and its ETA)
+SERVICEABILITY_URL = os.getenv(
+    "ZEPTO_SERVICEABILITY_URL", "https://api.zeptonow.com/api/v1/config/layout/"
+)
+
+BASE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/120.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/json, text/plain, */*",
+    "Accept-Language": "en-IN,en;q=0.9",
+    "Origin": WEB_BASE,
+    "Referer": f"{WEB_BASE}/",
+    "app_sub_platform": "WEB",
+    "platform": "WEB",
+}
+
+POOL_SIZE = int(os.getenv("ZEPTO_POOL_SIZE", "8"))
+
+
+class ZeptoClient:
+    """Thread-safe wrapper around a warmed requests.Session for Zepto."""
+
+    def __init__(self, pool_size: int = POOL_SIZE):
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, pool_block=False)
+
+        self.session = requests.Session()
+        self.session.headers.update(BASE_HEADERS)
+        self.session.headers["Connection"] = "keep-alive"
+        self.session.headers["device_id"] = str(uuid.uuid4())
+        self.session.headers["session_id"] = str(uuid.uuid4())
+        self.session.mount("https://", adapter)
+
+        self._warm = False
+        self._warm_lock = threading.Lock()
+
+    def warm(self, timeout: float = 5):
+        """Load the storefront once so the session carries Zepto's cookies."""
+        if self._warm:
+            return
+        with self._warm_lock:
+            if self._warm:
+                return
+            try:
+                self.session.get(WEB_BASE, timeout=timeout,
+                                 headers={"Accept": "text/html,application/xhtml+xml"})
+            except requests.RequestException as e:
+                # Cookies help but are not required; the lookup itself may still work
+                logger.debug(f"Zepto warm-up failed: {e}")
+            self._warm = True
+
+    def get_serviceability(self, lat: float, lng: float, timeout: float = 5) -> dict:
+        """Serving store and delivery details for a coordinate (raw JSON)."""
+        self.warm()
+        params = {"latitude": lat, "longitude": lng, "page_type": "HOME", "version": "v2"}
+        resp = retry.call(
+            lambda: self.session.get(SERVICEABILITY_URL, params=params, timeout=retry.bound_timeout(timeout)),
+            label="Zepto serviceability",
+        )
+        resp.raise_for_status()
+        return jsonio.parse_response(resp)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ZeptoClient:
+    """Return the process-wide Zepto client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ZeptoClient()
+                logger.debug(f"Zepto client ready (pool size {POOL_SIZE})")
+    return _client
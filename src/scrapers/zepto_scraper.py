@@ -1,111 +1,87 @@
 # zepto_scraper.py - OPTIMIZED VERSION
 # Uses API interception for 60% faster scraping (~4s vs ~10s)
-from playwright.sync_api import sync_playwright, TimeoutError
+import asyncio
 import re
 import logging
 
+try:
+    from src.core import browser_profile, jsonio
+    from src.core.product import Product
+except ImportError:
+    # When running directly, add project root to path
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    from src.core import browser_profile, jsonio
+    from src.core.product import Product
+
 logger = logging.getLogger(__name__)
 
+# Compiled once; the parsers run for every product of every search
+_SPACES_RE = re.compile(r'\s+')
+_PRICE_RES = (
+    re.compile(r'₹\s*(\d{1,3}(?:,\d{3})*(?:\.\d+)?)'),
+    re.compile(r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s*₹'),
+)
+_PRICE_DIGITS_RE = re.compile(r'₹\s*(\d+)')
+
+# Slug for /pn/{slug}/pvid/{variant-id}: one translate pass for the fixed
+# substitutions, then drop remaining symbols and collapse separators
+_SLUG_TABLE = str.maketrans({
+    '(': None, ')': None, '[': None, ']': None,
+    ',': None, '.': None, '!': None, '?': None,
+    '&': 'and', '+': 'plus', '/': '-', '\\': '-',
+})
+_SLUG_DROP_RE = re.compile(r'[^\w\s-]')
+_SLUG_SEP_RE = re.compile(r'[\s-]+')
+
+IMAGE_BASE = "https://cdn.zeptonow.com/"
+PRODUCT_BASE = "https://www.zeptonow.com/pn/"
+
+
 def clean_price(price_str: str) -> str:
     """Clean price string"""
     if not price_str:
         return "N/A"
     
-    price_str = re.sub(r'\s+', ' ', str(price_str).strip())
+    price_str = _SPACES_RE.sub(' ', str(price_str).strip())
     
-    patterns = [
-        r'₹\s*(\d{1,3}(?:,\d{3})*(?:\.\d+)?)',
-        r'(\d{1,3}(?:,\d{3})*(?:\.\d+)?)\s*₹'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, price_str)
+    for pattern in _PRICE_RES:
+        match = pattern.search(price_str)
         if match:
             return f"₹{match.group(1)}"
     
     if '₹' in price_str:
-        numbers = re.findall(r'₹\s*(\d+)', price_str)
-        if numbers:
-            return f"₹{numbers[0]}"
+        match = _PRICE_DIGITS_RE.search(price_str)
+        if match:
+            return f"₹{match.group(1)}"
     
     return "N/A"
 
-def run_zepto_scraper(search_query: str):
-    """Optimized Zepto scraper using API interception"""
+
+def make_slug(name: str) -> str:
+    """URL slug Zepto uses for a product name."""
+    slug = _SLUG_DROP_RE.sub('', name.lower().translate(_SLUG_TABLE))
+    return _SLUG_SEP_RE.sub('-', slug).strip('-')
+
+async def run_zepto_scraper(search_query: str):
+    """
+    Optimized Zepto scraper using API interception
+    Runs on the async Playwright API in the shared browser (one context per
+    search), so concurrent searches share one Chromium and no thread.
+    """
     
     products = []
-    browser = None
     
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-gpu',
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage'
-                ]
-            )
-            
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-                viewport={"width": 1920, "height": 1080}
-            )
-            
-            # Stealth
-            context.add_init_script("Object.defineProperty(navigator, 'webdriver', { get: () => undefined });")
-            
-            # Block images, fonts, media, CSS for speed
-            context.route("**/*", lambda route: (
-                route.abort() if route.request.resource_type in ['image', 'font', 'media', 'stylesheet']
-                else route.continue_()
-            ))
-            
-            page = context.new_page()
+        async with browser_profile.get_shared_browser().context("zepto") as context:
+            page = await context.new_page()
             
             # Intercept API response
-            def handle_response(response):
+            async def handle_response(response):
                 if '/api/v3/search' in response.url and response.status == 200:
                     try:
-                        data = response.json()
-                        layout = data.get('layout', [])
-                        
-                        for widget in layout:
-                            widget_data = widget.get('data', {})
-                            if not widget_data:
-                                continue
-                            
-                            resolver = widget_data.get('resolver', {})
-                            if not resolver:
-                                continue
-                            
-                            resolver_data = resolver.get('data', {})
-                            if not resolver_data:
-                                continue
-                            
-                            items = resolver_data.get('items', [])
-                            if not items:
-                                continue
-                            
-                            # Check resolver type
-                            resolver_type = resolver.get('type', '')
-                            
-                            if resolver_type == 'product_grid':
-                                # Direct products in product_grid
-                                for item in items:
-                                    extract_product_direct(item, products)
-                            else:
-                                # Other types (ads, etc.) may have nested PRODUCT_ITEM
-                                for item in items:
-                                    if item.get('type') == 'PRODUCT_ITEM':
-                                        extract_product(item, products)
-                                    elif 'data' in item:
-                                        nested_items = item.get('data', {}).get('items', [])
-                                        if nested_items:
-                                            for nested_item in nested_items:
-                                                if nested_item.get('type') == 'PRODUCT_ITEM':
-                                                    extract_product(nested_item, products)
+                        products.extend(iter_products(jsonio.loads(await response.body())))
                     except Exception as e:
                         logger.debug(f"Failed to parse API response: {e}")
             
@@ -113,118 +89,100 @@ def run_zepto_scraper(search_query: str):
             
             # Navigate with optimal settings
             url = f"https://www.zeptonow.com/search?query={search_query.replace(' ', '%20')}"
-            page.goto(url, timeout=15000, wait_until='domcontentloaded')
+            await browser_profile.goto_async(page, "zepto", url, timeout=15000, wait_until='domcontentloaded')
             
             # Wait for API response
-            page.wait_for_timeout(3000)
+            await page.wait_for_timeout(3000)
             
     except Exception as e:
+        # Failed, not empty: let the caller report an error instead of caching []
         logger.error(f"Zepto scraper failed for '{search_query}': {e}")
-    finally:
-        if browser:
-            try:
-                browser.close()
-            except Exception:
-                pass
+        raise
     
     return products
 
-def extract_product_direct(item, products_list):
-    """Extract product directly from product_grid items (new API structure)"""
+def iter_products(data):
+    """Every product in a /api/v3/search payload, in layout order."""
+    for widget in data.get('layout') or ():
+        resolver = (widget.get('data') or {}).get('resolver') or {}
+        items = (resolver.get('data') or {}).get('items')
+        if not items:
+            continue
+        
+        if resolver.get('type') == 'product_grid':
+            # Direct products in product_grid
+            for item in items:
+                product = extract_product_direct(item)
+                if product:
+                    yield product
+            continue
+        
+        # Other types (ads, etc.) may have PRODUCT_ITEMs, possibly one level down
+        for item in items:
+            if item.get('type') == 'PRODUCT_ITEM':
+                nested = (item,)
+            else:
+                nested = (item.get('data') or {}).get('items') or ()
+            for nested_item in nested:
+                if nested_item.get('type') == 'PRODUCT_ITEM':
+                    product = extract_product(nested_item)
+                    if product:
+                        yield product
+
+
+def _build_product(name, price, variant_info, in_stock):
+    """Shared tail of both item shapes: image, quantity and URL from the variant."""
+    images = variant_info.get('images')
+    img_path = images[0].get('path') if images else None
+    variant_id = variant_info.get('id')
+    
+    return Product(
+        platform="zepto",
+        name=name,
+        price=price,
+        quantity=variant_info.get('formattedPacksize', 'N/A'),
+        image_url=IMAGE_BASE + img_path if img_path else "",
+        product_url=f"{PRODUCT_BASE}{make_slug(name)}/pvid/{variant_id}" if variant_id else "",
+        in_stock=in_stock,
+    )
+
+
+def extract_product_direct(item):
+    """Product from a product_grid item (productResponse wrapper), or None."""
     try:
-        # New structure: productResponse wrapper
-        product_response = item.get('productResponse', {})
+        product_response = item.get('productResponse')
         if not product_response:
-            return
-        
-        product_info = product_response.get('product', {})
-        variant_info = product_response.get('productVariant', {})
+            return None
         
-        name = product_info.get('name', '')
-        # Price is now at top level of productResponse
+        name = (product_response.get('product') or {}).get('name')
+        # Price (in paise) is at the top level of productResponse
         price = product_response.get('discountedSellingPrice') or product_response.get('sellingPrice', 0)
+        if not (name and price):
+            return None
         
-        if name and price:
-            # Convert from paise to rupees
-            price = price / 100
-            
-            image_url = ''
-            images = variant_info.get('images', [])
-            if images and len(images) > 0:
-                img_path = images[0].get('path', '')
-                if img_path:
-                    image_url = f"https://cdn.zeptonow.com/{img_path}"
-            
-            quantity = variant_info.get('formattedPacksize', 'N/A')
-            
-            # Build proper URL: /pn/{slug}/pvid/{variant-id}
-            variant_id = variant_info.get('id', '')
-            # Create slug from product name - handle special characters
-            import re
-            slug = name.lower()
-            slug = slug.replace('(', '').replace(')', '').replace('[', '').replace(']', '')
-            slug = slug.replace(',', '').replace('.', '').replace('!', '').replace('?', '')
-            slug = slug.replace('&', 'and').replace('+', 'plus')
-            slug = slug.replace('/', '-').replace('\\', '-')
-            slug = re.sub(r'[^\w\s-]', '', slug)  # Remove remaining special chars except spaces and hyphens
-            slug = re.sub(r'\s+', '-', slug)  # Replace spaces with hyphens
-            slug = re.sub(r'-+', '-', slug)  # Replace multiple hyphens with single
-            slug = slug.strip('-')  # Remove leading/trailing hyphens
-            product_url = f"https://www.zeptonow.com/pn/{slug}/pvid/{variant_id}" if variant_id else ""
-            
-            in_stock = not product_response.get('outOfStock', False)
-            
-            products_list.append({
-                "platform": "zepto",
-                "name": name,
-                "price": f"₹{price:.0f}",
-                "quantity": quantity,
-                "image_url": image_url,
-                "product_url": product_url,
-                "in_stock": in_stock,
-            })
+        return _build_product(name, f"₹{price / 100:.0f}", product_response.get('productVariant') or {},
+                              not product_response.get('outOfStock', False))
     except Exception as e:
         logger.debug(f"Failed to extract product: {e}")
+        return None
+
 
-def extract_product(item, products_list):
-    """Extract product from PRODUCT_ITEM (nested structure - fallback)"""
+def extract_product(item):
+    """Product from a PRODUCT_ITEM (nested structure - fallback), or None."""
     try:
-        item_data = item.get('data', {})
-        product_info = item_data.get('product', {})
-        variant_info = item_data.get('productVariant', {})
+        item_data = item.get('data') or {}
+        variant_info = item_data.get('productVariant') or {}
         
-        name = product_info.get('name', '')
-        price_obj = variant_info.get('price', {})
-        price = price_obj.get('sp', 0) if price_obj else 0
+        name = (item_data.get('product') or {}).get('name')
+        price = (variant_info.get('price') or {}).get('sp', 0)
+        if not (name and price):
+            return None
         
-        if name and price:
-            image_url = ''
-            images = variant_info.get('images', [])
-            if images and len(images) > 0:
-                img_path = images[0].get('path', '')
-                if img_path:
-                    image_url = f"https://cdn.zeptonow.com/{img_path}"
-            
-            quantity = variant_info.get('formattedPacksize', 'N/A')
-            
-            # Build proper URL
-            variant_id = variant_info.get('id', '')
-            slug = name.lower().replace(' ', '-').replace('(', '').replace(')', '').replace(',', '')
-            product_url = f"https://www.zeptonow.com/pn/{slug}/pvid/{variant_id}" if variant_id else ""
-            
-            in_stock = variant_info.get('isAvailable', True)
-            
-            products_list.append({
-                "platform": "zepto",
-                "name": name,
-                "price": f"₹{price}",
-                "quantity": quantity,
-                "image_url": image_url,
-                "product_url": product_url,
-                "in_stock": in_stock,
-            })
+        return _build_product(name, f"₹{price}", variant_info, variant_info.get('isAvailable', True))
     except Exception as e:
         logger.debug(f"Failed to extract nested product: {e}")
+        return None
+
 
 # Required for app.py import
 def product_key(item):
@@ -235,7 +193,13 @@ def is_complete(item):
 
 # --- Manual test ---
 if __name__ == "__main__":
-    out = run_zepto_scraper("amul milk")
+    async def main():
+        try:
+            return await run_zepto_scraper("amul milk")
+        finally:
+            await browser_profile.get_shared_browser().close()
+
+    out = asyncio.run(main())
     from pprint import pprint
     pprint(out[:10])
     print("Total:", len(out))
@@ -134,34 +134,65 @@ async function performSearch(query) {
     addToRecent(query);
     elements.resultsQuery.textContent = `"${query}"`;
     showPage('loading');
+    searchResults = [];
 
     try {
-        const response = await fetch('/search', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-                query: query,
-                ...locationData
-            })
+        // Results stream in as each platform finishes (NDJSON, one event per line)
+        await streamSearch(query, (event) => {
+            searchResults = event.results || [];
+            if (searchResults.length > 0 || event.event === 'done') {
+                showSearchResults(searchResults);
+            }
         });
-
-        if (response.ok) {
-            searchResults = await response.json();
-        } else {
-            throw new Error('Search failed');
-        }
     } catch (error) {
         console.error('Search error:', error);
-        searchResults = [];
+        showSearchResults(searchResults);
+    }
+}
+
+async function streamSearch(query, onEvent) {
+    const response = await fetch('/search/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            query: query,
+            ...locationData
+        })
+    });
+
+    if (!response.ok || !response.body) {
+        throw new Error('Search failed');
     }
 
-    setTimeout(() => {
-        lastResults = searchResults;
-        activePlatform = 'all';
-        renderResults(searchResults);
-        filterPlatform('all');
-        showPage('results');
-    }, 2000);
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+
+        for (const line of lines) {
+            if (line.trim()) {
+                onEvent(JSON.parse(line));
+            }
+        }
+    }
+
+    if (buffer.trim()) {
+        onEvent(JSON.parse(buffer));
+    }
+}
+
+function showSearchResults(results) {
+    lastResults = results;
+    // Keep the user's platform filter while later platforms stream in
+    filterPlatform(currentPage === 'results' ? activePlatform : 'all');
+    showPage('results');
 }
 
 // Recent searches
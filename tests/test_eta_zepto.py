@@ -0,0 +1,77 @@
+"""Zepto ETA: serviceability parsing and the per-cell memo."""
+import json
+import os
+
+import pytest
+
+from src.eta import eta_zepto
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+@pytest.fixture(autouse=True)
+def clear_memo():
+    eta_zepto._cell_etas.clear()
+    eta_zepto._cell_fallbacks.clear()
+
+
+def test_parse_reads_store_eta_not_widgets():
+    assert eta_zepto.parse_serviceability(load("zepto_serviceability.json")) == "11 min"
+
+
+def test_parse_unserviceable_store():
+    data = load("zepto_serviceability_closed.json")
+    assert eta_zepto.parse_serviceability(data) == eta_zepto.STORE_UNAVAILABLE
+
+
+def test_parse_without_store_fields():
+    assert eta_zepto.parse_serviceability({"layout": [{"data": {"eta": 10}}]}) is None
+
+
+def test_api_eta_memoized_per_cell(monkeypatch):
+    calls = []
+
+    class Client:
+        def get_serviceability(self, lat, lng):
+            calls.append((lat, lng))
+            return load("zepto_serviceability.json")
+
+    monkeypatch.setattr(eta_zepto, "geocode_address", lambda address: (18.5074, 73.8077))
+    monkeypatch.setattr(eta_zepto, "get_client", Client)
+    assert eta_zepto.get_zepto_eta("Kothrud, Pune") == "11 min"
+    assert eta_zepto.get_zepto_eta("Kothrud Depot, Pune") == "11 min"
+    assert len(calls) == 1
+
+
+def test_fallback_result_memoized(monkeypatch):
+    ui_calls, api_calls = [], []
+
+    class Client:
+        def get_serviceability(self, lat, lng):
+            api_calls.append((lat, lng))
+            raise ValueError("unexpected response")
+
+    def ui(address, headed=False):
+        ui_calls.append(address)
+        return "14 min"
+
+    monkeypatch.setattr(eta_zepto, "geocode_address", lambda address: (18.5074, 73.8077))
+    monkeypatch.setattr(eta_zepto, "get_client", Client)
+    monkeypatch.setattr(eta_zepto, "_eta_from_ui", ui)
+    assert eta_zepto.get_zepto_eta("Kothrud, Pune") == "14 min"
+    assert eta_zepto.get_zepto_eta("Kothrud, Pune") == "14 min"
+    assert len(ui_calls) == 1 and len(api_calls) == 1
+
+
+def test_ungeocodable_address_memoized(monkeypatch):
+    ui_calls = []
+    monkeypatch.setattr(eta_zepto, "geocode_address", lambda address: (None, None))
+    monkeypatch.setattr(eta_zepto, "_eta_from_ui", lambda address, headed=False: ui_calls.append(address) or "Error")
+    assert eta_zepto.get_zepto_eta("Somewhere") == "Error"
+    assert eta_zepto.get_zepto_eta(" somewhere ") == "Error"
+    assert len(ui_calls) == 1